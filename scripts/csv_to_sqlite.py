@@ -5,11 +5,34 @@ CSV_PATH = "data/nrel_alt_fuel_stations_raw.csv"
 DB_PATH = "tests/fixtures/nrel_sample.sqlite"
 TABLE_NAME = "fuel_stations"
 
+# Pre-aggregated station counts for the common GROUP BY questions.
+# They are regular tables, so the schema loader lists them in the prompt
+# and the generator can read agg_by_<column> instead of scanning fuel_stations.
+ROLLUP_COLUMNS = ("state", "fuel_type_code", "city", "owner_type_code", "status_code")
+
+# Default C engine on purpose: engine="pyarrow" infers timestamp/date columns
+# (updated_at, open_date), which changes the stored strings and the schema.
 df = pd.read_csv(CSV_PATH)
 
 conn = sqlite3.connect(DB_PATH)
+# Bulk load: the DB is rebuilt from the CSV anyway, so skip journaling and fsyncs.
+conn.execute("PRAGMA journal_mode=OFF")
+conn.execute("PRAGMA synchronous=OFF")
 df.columns = [c.replace(".", "__") for c in df.columns]
-df.to_sql(TABLE_NAME, conn, if_exists="replace", index=False)
+# pandas runs all chunks in one transaction; executemany over a single prepared
+# INSERT is the fast path for sqlite3 (multi-row VALUES would hit the bound-parameter cap).
+df.to_sql(TABLE_NAME, conn, if_exists="replace", index=False, chunksize=50_000)
+
+# fuel_stations was just replaced, so rebuild every roll-up from scratch.
+for col in ROLLUP_COLUMNS:
+    agg_table = f"agg_by_{col}"
+    conn.execute(f'DROP TABLE IF EXISTS "{agg_table}"')
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{agg_table}" AS '
+        f'SELECT "{col}", COUNT(*) AS station_count FROM "{TABLE_NAME}" GROUP BY "{col}"'
+    )
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{agg_table}_{col}" ON "{agg_table}" ("{col}")')
+conn.commit()
 conn.close()
 
 print("SQLite DB created:", DB_PATH)
@@ -1,5 +1,6 @@
 # scripts/demo_end_to_end.py
 import argparse
+from pathlib import Path
 
 from src.end_to_end import run_and_report, RunAndReportConfig, ReportItem
 
@@ -11,6 +12,7 @@ def main():
     ap.add_argument("--title", default="Mock Analytics Team Report")
     ap.add_argument("--max_attempts", type=int, default=3)
     ap.add_argument("--preview_rows", type=int, default=12)
+    ap.add_argument("--no_cache", action="store_true", help="Always regenerate SQL (ignore the on-disk SQL cache).")
     ap.add_argument("--q", action="append", help="Question (repeatable). If omitted, uses a default suite.")
     args = ap.parse_args()
 
@@ -19,6 +21,9 @@ def main():
         report_title=args.title,
         max_attempts=args.max_attempts,
         preview_rows=args.preview_rows,
+        # the SQL cache lives next to the report it speeds up
+        sql_cache_path=str(Path(args.out) / "sql_cache.sqlite"),
+        no_cache=args.no_cache,
     )
 
     if args.q:
@@ -2,15 +2,21 @@
 from __future__ import annotations
 
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+import orjson
 
 from src.schema_service import SchemaService
 from src.sql_generator import SQLGenerator, GenerationConfig
 from src.query_executor import QueryExecutor
 from src.retry_logic import RetryRunner
+from src.sql_policy import SQLPolicy
 
 DB = "tests/fixtures/nrel_sample.sqlite"
+WORKERS = 4
 
 OUT_DIR = Path("reports/phase4_retries")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -24,29 +30,42 @@ QUESTIONS = [
     "How many stations were updated in the last year?",
     "Show 50 stations in California with station_name and street_address",
 ]
-def attempt_to_dict(a):
-    d = a.__dict__.copy()
-    if d.get("error_feedback") is not None:
-        d["error_feedback"] = {
-            "category": d["error_feedback"].category,
-            "message": d["error_feedback"].message,
-            "details": d["error_feedback"].details,
-        }
-    return d
 def main():
     svc = SchemaService(DB)
     gen = SQLGenerator(svc, GenerationConfig(max_new_tokens=256, do_sample=False))
-    executor = QueryExecutor(DB, timeout_ms=2000, max_rows=1000)
-
-    runner_no_retry = RetryRunner(gen, executor, max_attempts=1, stop_on_repeat_sql=True)
-    runner_retry = RetryRunner(gen, executor, max_attempts=3, stop_on_repeat_sql=True)
+    policy = SQLPolicy()
+
+    # Per-thread executor + runners; the generator is shared across workers.
+    local = threading.local()
+    executors: List[QueryExecutor] = []
+
+    def runners() -> Tuple[RetryRunner, RetryRunner]:
+        if not hasattr(local, "runners"):
+            executor = QueryExecutor(DB, timeout_ms=2000, max_rows=1000)
+            executors.append(executor)
+            local.runners = (
+                RetryRunner(gen, executor, policy=policy, max_attempts=1, stop_on_repeat_sql=True),
+                RetryRunner(gen, executor, policy=policy, max_attempts=3, stop_on_repeat_sql=True),
+            )
+        return local.runners
+
+    def run_question(item):
+        q, first = item
+        runner_no_retry, runner_retry = runners()
+        return q, runner_no_retry.run(q, first_generation=first), runner_retry.run(q, first_generation=first)
 
     rows: List[Dict[str, Any]] = []
 
-    for q in QUESTIONS:
-        r1 = runner_no_retry.run(q)
-        r3 = runner_retry.run(q)
+    # Attempt 1 is identical for both runners: generate it once, batched over all questions.
+    first_attempts = gen.generate_sql_batch(QUESTIONS, policy=policy)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        results = list(pool.map(run_question, zip(QUESTIONS, first_attempts)))
+
+    for executor in executors:
+        executor.close()
 
+    for q, r1, r3 in results:
         rows.append({
             "question": q,
             "no_retry_ok": r1.ok,
@@ -59,8 +78,9 @@ def main():
             "retry_converged": bool(r3.ok),
             "retry_oscillated": (r3.stop_reason == "oscillation"),
 
-            "no_retry_attempts": [attempt_to_dict(a) for a in r1.attempts],
-            "retry_attempts": [attempt_to_dict(a) for a in r3.attempts],
+            # AttemptRecord / ErrorFeedback are dataclasses; orjson serializes them natively.
+            "no_retry_attempts": r1.attempts,
+            "retry_attempts": r3.attempts,
         })
 
 
@@ -70,9 +90,9 @@ def main():
 
     # Save logs
     jsonl_path = OUT_DIR / "retry_eval.jsonl"
-    with jsonl_path.open("w", encoding="utf-8") as f:
+    with jsonl_path.open("wb", buffering=1 << 20) as f:
         for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            f.write(orjson.dumps(r, default=str) + b"\n")
 
     # Metrics
     n = len(rows)
@@ -2,37 +2,41 @@
 from __future__ import annotations
 
 import argparse
-import hashlib
+import dataclasses
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
 from src.schema_service import SchemaService
-from src.sql_generator import SQLGenerator, GenerationConfig
+from src.sql_generator import SQLGenerator, GenerationConfig, GenerationResult
 from src.sql_policy import SQLPolicy
 from src.sql_validator import validate_sql
 from src.sql_rewriter import rewrite_sql
 from src.query_executor import QueryExecutor
 from src.retry_logic import RetryRunner, RetryResult
+from src.result_cache import ResultCache, result_cache_key
+from src.eval_fast import (
+    check_result_properties,
+    check_sql_expectations,
+    fingerprint_result,
+    prepare_expect,
+    sql_fingerprint,
+)
 
 
 # ----------------------------
 # Helpers
 # ----------------------------
 
-def sha256_text(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
-
-def fingerprint_result(columns: Tuple[str, ...], rows: List[Tuple[Any, ...]]) -> str:
-    payload = {"columns": list(columns), "rows": [list(r) for r in rows]}
-    txt = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
-    return sha256_text(txt)
-
-def norm_sql(sql: str) -> str:
-    return " ".join((sql or "").split()).strip().upper()
-
 def load_cases(path: str) -> List[Dict[str, Any]]:
     cases: List[Dict[str, Any]] = []
     with open(path, "r", encoding="utf-8") as f:
@@ -43,60 +47,6 @@ def load_cases(path: str) -> List[Dict[str, Any]]:
             cases.append(json.loads(line))
     return cases
 
-def check_sql_expectations(sql: str, expect: Dict[str, Any]) -> Tuple[bool, List[str]]:
-    reasons: List[str] = []
-    s = (sql or "")
-    u = s.upper()
-
-    ok = True
-
-    for frag in expect.get("sql_contains", []):
-        if frag.upper() not in u:
-            ok = False
-            reasons.append(f"sql_missing:{frag}")
-
-    sql_regex = expect.get("sql_regex")
-    if sql_regex:
-        import re
-        if not re.search(sql_regex, s, flags=re.IGNORECASE | re.DOTALL):
-            ok = False
-            reasons.append("sql_regex_no_match")
-
-    sql_not_contains = expect.get("sql_not_contains", [])
-    for frag in sql_not_contains:
-        if frag.upper() in u:
-            ok = False
-            reasons.append(f"sql_forbidden_contains:{frag}")
-
-    return ok, reasons
-
-def check_result_properties(columns: Tuple[str, ...], rows: List[Tuple[Any, ...]], props: Dict[str, Any]) -> Tuple[bool, List[str]]:
-    reasons: List[str] = []
-    ok = True
-
-    cols = [c.lower() for c in columns]
-
-    cols_need = [c.lower() for c in props.get("columns_contains", [])]
-    for c in cols_need:
-        if c not in cols:
-            ok = False
-            reasons.append(f"missing_column:{c}")
-
-    n = len(rows)
-    if "row_count_equals" in props and n != int(props["row_count_equals"]):
-        ok = False
-        reasons.append(f"row_count_not_equal:{n}")
-
-    if "min_rows" in props and n < int(props["min_rows"]):
-        ok = False
-        reasons.append(f"min_rows_failed:{n}")
-
-    if "max_rows" in props and n > int(props["max_rows"]):
-        ok = False
-        reasons.append(f"max_rows_failed:{n}")
-
-    return ok, reasons
-
 
 # ----------------------------
 # Core pipeline (Phase 5)
@@ -110,9 +60,21 @@ class RunOutcome:
     sql_hash: Optional[str]
     result_fingerprint: Optional[str]
     columns: Optional[Tuple[str, ...]]
-    rows: Optional[List[Tuple[Any, ...]]]
     attempts_used: int
     validation_ok: Optional[bool]
+    row_count: Optional[int] = None
+
+
+def _outcome_from_cache(value: Dict[str, Any]) -> RunOutcome:
+    # sidecar entries written before RunOutcome dropped `rows` still carry it
+    value = {k: v for k, v in value.items() if k != "rows"}
+    columns = value.get("columns")
+    return RunOutcome(**{**value, "columns": tuple(columns) if columns is not None else None})
+
+
+def _cacheable(gen: SQLGenerator, cache: Optional[ResultCache]) -> bool:
+    # Sampled generations are not reproducible, so never serve them from cache.
+    return cache is not None and not gen.cfg.do_sample
 
 
 def run_once_no_retry(
@@ -121,46 +83,69 @@ def run_once_no_retry(
     gen: SQLGenerator,
     executor: QueryExecutor,
     policy: SQLPolicy,
-) -> RunOutcome:
+    cache: Optional[ResultCache] = None,
+) -> Tuple[RunOutcome, Optional[GenerationResult]]:
+    """
+    Also returns the generation so a retry run can reuse it as attempt 1;
+    on a cache hit nothing was generated and None is returned in its place.
+    """
+    key = None
+    if _cacheable(gen, cache):
+        key = result_cache_key(question, gen.schema_service.schema_version(), policy, gen.cfg, mode="no_retry")
+        hit = cache.get(key)
+        if hit is not None:
+            return _outcome_from_cache(hit), None
+
     gen_res = gen.generate_sql(question, policy=policy)
+    out = _run_once_no_retry(gen_res=gen_res, executor=executor, policy=policy)
+    if key is not None:
+        cache.put(key, dataclasses.asdict(out))
+    return out, gen_res
+
+
+def _run_once_no_retry(
+    *,
+    gen_res: GenerationResult,
+    executor: QueryExecutor,
+    policy: SQLPolicy,
+) -> RunOutcome:
     dec = validate_sql(gen_res.sql_clean, policy=policy)
     if not dec.ok:
         return RunOutcome(
             ok=False,
             stop_reason="validation_failed",
             sql=gen_res.sql_clean,
-            sql_hash=sha256_text(norm_sql(gen_res.sql_clean)),
+            sql_hash=sql_fingerprint(gen_res.sql_clean)[1],
             result_fingerprint=None,
             columns=None,
-            rows=None,
             attempts_used=1,
             validation_ok=False,
         )
 
     rewritten = rewrite_sql(gen_res.sql_clean, policy=policy).sql
+    _, sql_hash = sql_fingerprint(rewritten)
     try:
-        exec_res = executor.execute(rewritten)
-        fp = fingerprint_result(exec_res.columns, exec_res.rows)
+        # Scoring only needs the column names, row count and fingerprint.
+        summary = executor.execute_streaming(rewritten)
         return RunOutcome(
             ok=True,
             stop_reason="success",
             sql=rewritten,
-            sql_hash=sha256_text(norm_sql(rewritten)),
-            result_fingerprint=fp,
-            columns=exec_res.columns,
-            rows=exec_res.rows,
+            sql_hash=sql_hash,
+            result_fingerprint=summary.fingerprint,
+            columns=summary.columns,
             attempts_used=1,
             validation_ok=True,
+            row_count=summary.row_count,
         )
     except Exception as e:
         return RunOutcome(
             ok=False,
             stop_reason=getattr(e, "code", "execution_failed"),
             sql=rewritten,
-            sql_hash=sha256_text(norm_sql(rewritten)),
+            sql_hash=sql_hash,
             result_fingerprint=None,
             columns=None,
-            rows=None,
             attempts_used=1,
             validation_ok=True,
         )
@@ -170,8 +155,38 @@ def run_once_retry(
     *,
     question: str,
     runner: RetryRunner,
+    cache: Optional[ResultCache] = None,
+    first_generation: Optional[GenerationResult] = None,
+) -> Tuple[RunOutcome, Optional[RetryResult]]:
+    """
+    On a cache hit the RetryResult is not available and None is returned in its place.
+    """
+    key = None
+    if _cacheable(runner.generator, cache):
+        key = result_cache_key(
+            question,
+            runner.generator.schema_service.schema_version(),
+            runner.policy,
+            runner.generator.cfg,
+            mode=f"retry:{runner.max_attempts}:{runner.stop_on_repeat_sql}",
+        )
+        hit = cache.get(key)
+        if hit is not None:
+            return _outcome_from_cache(hit), None
+
+    out, rr = _run_once_retry(question=question, runner=runner, first_generation=first_generation)
+    if key is not None:
+        cache.put(key, dataclasses.asdict(out))
+    return out, rr
+
+
+def _run_once_retry(
+    *,
+    question: str,
+    runner: RetryRunner,
+    first_generation: Optional[GenerationResult] = None,
 ) -> Tuple[RunOutcome, RetryResult]:
-    rr = runner.run(question)
+    rr = runner.run(question, first_generation=first_generation)
     if not rr.ok:
         # best effort: capture last attempted sql
         last_sql = rr.attempts[-1].rewritten_sql or rr.attempts[-1].sql_clean if rr.attempts else None
@@ -180,10 +195,9 @@ def run_once_retry(
                 ok=False,
                 stop_reason=rr.stop_reason,
                 sql=last_sql,
-                sql_hash=sha256_text(norm_sql(last_sql or "")) if last_sql else None,
+                sql_hash=sql_fingerprint(last_sql)[1] if last_sql else None,
                 result_fingerprint=None,
                 columns=None,
-                rows=None,
                 attempts_used=len(rr.attempts),
                 validation_ok=None,
             ),
@@ -196,12 +210,12 @@ def run_once_retry(
             ok=True,
             stop_reason="success",
             sql=rr.final_sql,
-            sql_hash=sha256_text(norm_sql(rr.final_sql or "")) if rr.final_sql else None,
+            sql_hash=sql_fingerprint(rr.final_sql)[1] if rr.final_sql else None,
             result_fingerprint=fp,
             columns=rr.columns,
-            rows=rr.rows,
             attempts_used=len(rr.attempts),
             validation_ok=None,
+            row_count=len(rr.rows or []),
         ),
         rr,
     )
@@ -211,6 +225,27 @@ def run_once_retry(
 # Eval
 # ----------------------------
 
+RECORD_FIELDS = (
+    "mode", "case_id", "run", "question", "ok", "stop_reason", "attempts_used",
+    "sql", "sql_hash", "result_fingerprint", "correct", "reasons",
+)
+
+
+def _count_consistent(case_idx: np.ndarray, values: np.ndarray, n_cases: int) -> int:
+    """
+    Number of cases whose non-null values (>= 2 of them) are all identical.
+    """
+    present = np.array([v is not None for v in values], dtype=bool)
+    if not present.any():
+        return 0
+    idx = case_idx[present]
+    _, codes = np.unique(values[present].astype(str), return_inverse=True)
+    n_present = np.bincount(idx, minlength=n_cases)
+    distinct_pairs = np.unique(np.stack([idx, codes]), axis=1)
+    n_distinct = np.bincount(distinct_pairs[0], minlength=n_cases)
+    return int(((n_present >= 2) & (n_distinct == 1)).sum())
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", default=os.environ.get("DB_PATH", "tests/fixtures/nrel_sample.sqlite"))
@@ -221,6 +256,11 @@ def main() -> int:
     ap.add_argument("--max_attempts", type=int, default=3, help="Retry attempts when mode=retry/compare.")
     ap.add_argument("--timeout_ms", type=int, default=2000)
     ap.add_argument("--max_rows", type=int, default=1000)
+    ap.add_argument("--quantization", choices=["int8", "nf4"], default=None, help="Load the generator quantized.")
+    ap.add_argument("--compile_mode", default=None, help="torch.compile the generator forward with this mode.")
+    ap.add_argument("--result_cache", action="store_true", help="Serve repeated (question, mode) trials from a result cache.")
+    ap.add_argument("--result_cache_path", default=None, help="Optional SQLite sidecar to share the result cache across runs.")
+    ap.add_argument("--workers", type=int, default=1, help="Cases evaluated concurrently (threads).")
     args = ap.parse_args()
 
     outdir = Path(args.outdir)
@@ -228,79 +268,79 @@ def main() -> int:
 
     policy = SQLPolicy()
     svc = SchemaService(args.db)
-    gen = SQLGenerator(svc, GenerationConfig(max_new_tokens=256, do_sample=False))
-    executor = QueryExecutor(args.db, timeout_ms=args.timeout_ms, max_rows=args.max_rows)
-    runner = RetryRunner(gen, executor, max_attempts=args.max_attempts, stop_on_repeat_sql=True)
+    gen = SQLGenerator(svc, GenerationConfig(
+        max_new_tokens=256, do_sample=False, quantization=args.quantization, compile_mode=args.compile_mode
+    ))
+
+    # One executor/runner per worker thread (their SQLite connections are not shared);
+    # the generator is shared and serializes its own model calls.
+    local = threading.local()
+
+    def worker_runner() -> RetryRunner:
+        runner = getattr(local, "runner", None)
+        if runner is None:
+            executor = QueryExecutor(args.db, timeout_ms=args.timeout_ms, max_rows=args.max_rows)
+            runner = RetryRunner(gen, executor, max_attempts=args.max_attempts, stop_on_repeat_sql=True)
+            local.runner = runner
+        return runner
+
+    cache: Optional[ResultCache] = None
+    if args.result_cache or args.result_cache_path:
+        cache = ResultCache(args.result_cache_path)
 
     cases = load_cases(args.cases)
 
     # records.jsonl: one record per (case, run, mode)
     jsonl_path = outdir / "records.jsonl"
-    f = jsonl_path.open("w", encoding="utf-8")
-
-    def eval_mode(mode: str) -> Dict[str, Any]:
-        total = 0
-        exec_ok = 0
-        correct_ok = 0
-        consistent_sql = 0
-        consistent_result = 0
-        allow_fail_count = 0
-
-        for case in cases:
-            cid = case.get("id", "")
-            q = case["question"]
-            expect = case.get("expect", {})
-            allow_fail = bool(expect.get("allow_fail", False))
-            if allow_fail:
-                allow_fail_count += 1
-
-            run_outcomes: List[RunOutcome] = []
-            sql_hashes: List[Optional[str]] = []
-            res_fps: List[Optional[str]] = []
-
-            for r in range(1, args.runs + 1):
-                if mode == "no_retry":
-                    out = run_once_no_retry(question=q, gen=gen, executor=executor, policy=policy)
-                    rr = None
-                else:
-                    out, rr = run_once_retry(question=q, runner=runner)
-
-                run_outcomes.append(out)
-                sql_hashes.append(out.sql_hash)
-                res_fps.append(out.result_fingerprint)
-
+    f = jsonl_path.open("wb", buffering=1 << 20)
+
+    def eval_case(case: Dict[str, Any], modes: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        """
+        Runs all trials of one case for every requested mode in a single pass.
+        Returns its records; writing and aggregation stay on the driver thread.
+        """
+        runner = worker_runner()
+        records: List[Dict[str, Any]] = []
+
+        cid = case.get("id", "")
+        q = case["question"]
+        expect = case.get("expect", {})
+        prepared = prepare_expect(expect)
+
+        for r in range(1, args.runs + 1):
+            outs: Dict[str, RunOutcome] = {}
+            gen_res: Optional[GenerationResult] = None
+            if "no_retry" in modes:
+                outs["no_retry"], gen_res = run_once_no_retry(
+                    question=q, gen=gen, executor=runner.executor, policy=policy, cache=cache
+                )
+            if "retry" in modes:
+                # Same deterministic generator and prompt: the no-retry generation *is* retry's attempt 1.
+                first = gen_res if policy == runner.policy else None
+                outs["retry"], _ = run_once_retry(question=q, runner=runner, cache=cache, first_generation=first)
+
+            for mode, out in outs.items():
                 # correctness checks only if execution ok (otherwise meaningless)
                 sql_ok = False
                 res_ok = False
                 reasons: List[str] = []
 
                 if out.ok and out.sql:
-                    sql_ok, r1 = check_sql_expectations(out.sql, expect)
+                    sql_ok, r1 = check_sql_expectations(out.sql, prepared)
                     reasons += r1
 
                     props = expect.get("result_props")
-                    if props and out.columns is not None and out.rows is not None:
-                        res_ok, r2 = check_result_properties(out.columns, out.rows, props)
+                    if props and out.columns is not None and out.row_count is not None:
+                        res_ok, r2 = check_result_properties(out.columns, out.row_count, props)
                         reasons += r2
                     else:
                         # if no props specified, treat result check as pass
                         res_ok = True
 
+                # is_correct implies ok, so allow_fail failures never count as correct
                 is_correct = out.ok and sql_ok and res_ok
 
-                # scoring
-                total += 1
-                if out.ok:
-                    exec_ok += 1
-
-                # If allow_fail and it failed, do not penalize correctness
-                if allow_fail and (not out.ok):
-                    pass
-                else:
-                    if is_correct:
-                        correct_ok += 1
-
-                record = {
+                records.append({
                     "mode": mode,
                     "case_id": cid,
                     "run": r,
@@ -313,23 +353,50 @@ def main() -> int:
                     "result_fingerprint": out.result_fingerprint,
                     "correct": is_correct,
                     "reasons": reasons,
-                }
-                f.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-            # consistency across runs (per case)
-            # only count if at least one successful run
-            good_sql_hashes = [h for h in sql_hashes if h is not None]
-            good_fps = [x for x in res_fps if x is not None]
-
-            if len(good_sql_hashes) >= 2 and len(set(good_sql_hashes)) == 1:
-                consistent_sql += 1
-            if len(good_fps) >= 2 and len(set(good_fps)) == 1:
-                consistent_result += 1
+                })
+
+        return records
+
+    modes = tuple(m for m in ("no_retry", "retry") if args.mode in (m, "compare"))
+
+    # Column-wise record buffer (one entry per trial), filled in case order.
+    columns: Dict[str, List[Any]] = {k: [] for k in RECORD_FIELDS}
+    case_index: List[int] = []
+
+    # map() yields in case order, so records.jsonl is identical for any --workers.
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for i, records in enumerate(pool.map(lambda c: eval_case(c, modes), cases)):
+            for record in records:
+                f.write(orjson.dumps(record) + b"\n")
+                for k in RECORD_FIELDS:
+                    columns[k].append(record[k])
+                case_index.append(i)
+
+    table = pa.Table.from_pydict(columns)
+    parquet_path = outdir / "records.parquet"
+    pq.write_table(table, parquet_path)
+
+    n_cases = len(cases)
+    allow_fail_count = sum(1 for c in cases if c.get("expect", {}).get("allow_fail", False))
+    mode_col = np.asarray(columns["mode"])
+    ok_col = np.asarray(columns["ok"], dtype=bool)
+    correct_col = np.asarray(columns["correct"], dtype=bool)
+    case_col = np.asarray(case_index, dtype=np.int64)
+    sql_hash_col = np.asarray(columns["sql_hash"], dtype=object)
+    fp_col = np.asarray(columns["result_fingerprint"], dtype=object)
 
-        n_cases = len(cases)
+    summaries: List[Dict[str, Any]] = []
+    for mode in modes:
+        m = mode_col == mode
+        total = int(m.sum())
+        exec_ok = int(ok_col[m].sum())
+        correct_ok = int(correct_col[m].sum())
+        # consistency across runs (per case); only cases with >= 2 successful runs count
+        consistent_sql = _count_consistent(case_col[m], sql_hash_col[m], n_cases)
+        consistent_result = _count_consistent(case_col[m], fp_col[m], n_cases)
         denom_correct = total  # includes all runs; allow_fail failures simply don't increment correct_ok
 
-        return {
+        summaries.append({
             "mode": mode,
             "cases": n_cases,
             "runs_per_case": args.runs,
@@ -339,15 +406,11 @@ def main() -> int:
             "cases_consistent_sql_rate": consistent_sql / n_cases if n_cases else 0.0,
             "cases_consistent_result_rate": consistent_result / n_cases if n_cases else 0.0,
             "allow_fail_cases": allow_fail_count,
-        }
-
-    summaries: List[Dict[str, Any]] = []
-    if args.mode in ("no_retry", "compare"):
-        summaries.append(eval_mode("no_retry"))
-    if args.mode in ("retry", "compare"):
-        summaries.append(eval_mode("retry"))
+        })
 
     f.close()
+    if cache is not None:
+        cache.close()
 
     summary_path = outdir / "summary.json"
     summary_path.write_text(json.dumps(summaries, indent=2), encoding="utf-8")
@@ -359,7 +422,7 @@ def main() -> int:
         f"- DB: `{args.db}`",
         f"- Cases: `{args.cases}`",
         f"- Runs per case: {args.runs}",
-        f"- Records: `{jsonl_path}`",
+        f"- Records: `{jsonl_path}` (columnar copy: `{parquet_path}`)",
         "",
         "| Mode | Exec Success | Correctness | Consistent SQL (per case) | Consistent Results (per case) |",
         "|------|--------------|-------------|----------------------------|-------------------------------|",
@@ -5,7 +5,6 @@ import argparse
 import os
 import sys
 
-from src.schema_service import SchemaService
 from src.prompts.schema_prompt import SCHEMA_CONTEXT_TEMPLATE
 
 
@@ -57,6 +56,9 @@ def main() -> int:
         print("ERROR: Provide --db or set DB_PATH/TEST_DB_PATH.", file=sys.stderr)
         return 2
 
+    # Imported after argument parsing so --help and usage errors stay instant.
+    from src.schema_service import SchemaService
+
     svc = SchemaService(args.db_path)
     schema = svc.schema()
     schema_blob = svc.schema_blob()
@@ -1,16 +1,21 @@
 # src/end_to_end.py
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import chain
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import orjson
 
-from src.schema_service import SchemaService
 from src.sql_policy import SQLPolicy
-from src.sql_generator import SQLGenerator, GenerationConfig
 from src.query_executor import QueryExecutor
+from src.lazy_generator import get_generator
 from src.retry_logic import RetryRunner, RetryResult
+from src.sql_cache import SQLCache
+from src.report_io import json_default, write_bytes, write_lines
 
 from src.summarizer import (
     summarize_table,
@@ -36,20 +41,107 @@ class RunAndReportConfig:
     preview_rows: int = 12
     model_name: str = "Qwen/Qwen2.5-Coder-7B-Instruct"
     max_new_tokens: int = 256
+    # Persistent question -> SQL cache (opt-in, as in ReportConfig); repeat
+    # report runs skip generation.
+    sql_cache_path: Optional[str] = None
+    no_cache: bool = False
+    # Concurrent questions; None -> min(8, number of questions).
+    workers: Optional[int] = None
+    # fsync report.md / run_log.json before returning.
+    durable: bool = False
+
+
+def _render_header(cfg: RunAndReportConfig, total: int, ok_count: int) -> Iterator[str]:
+    yield f"# {cfg.report_title}"
+    yield ""
+    yield "## Executive summary"
+    yield f"- Database: `{cfg.db_path}`"
+    yield f"- Retry cap: {cfg.max_attempts}"
+    yield f"- Successful queries: {ok_count}/{total}"
+    yield f"- Read-only execution: enabled"
+    yield ""
+
+
+def _render_item(
+    cfg: RunAndReportConfig,
+    it: ReportItem,
+    rr: RetryResult,
+    known_types: Optional[Dict[str, str]] = None,
+) -> Iterator[str]:
+    """
+    One report section, one line (or pre-rendered block) at a time.
+    """
+    yield f"## {it.title}"
+    yield ""
+    yield f"**Question:** {it.question}"
+    yield ""
+
+    if not rr.ok:
+        yield f"**Status:** FAILED ({rr.stop_reason})"
+        yield ""
+        if rr.attempts:
+            last = rr.attempts[-1]
+            yield "**Last attempted SQL (best effort):**"
+            yield "```sql"
+            yield ((last.rewritten_sql or last.sql_clean) or "").strip()
+            yield "```"
+            if last.error_feedback:
+                yield "**Error:**"
+                yield f"- Category: {last.error_feedback.category}"
+                yield f"- Message: {last.error_feedback.message}"
+        yield ""
+        return
+
+    sql = rr.final_sql or ""
+    cols = rr.columns or ()
+    rows = rr.rows or []
+
+    yield "**SQL:**"
+    yield "```sql"
+    yield sql.strip()
+    yield "```"
+    yield ""
+
+    ts = summarize_table(cols, rows, title="Table summary", known_types=known_types)
+    yield render_summary_markdown(ts)
+    yield ""
+    yield "**Preview:**"
+    yield ""
+    yield render_markdown_table(cols, rows, max_rows=cfg.preview_rows)
+    yield ""
+
+
+def _run_logs(report_items: List[ReportItem], results: List[RetryResult]) -> List[Dict[str, Any]]:
+    logs: List[Dict[str, Any]] = []
+    for it, rr in zip(report_items, results):
+        if not rr.ok:
+            logs.append({
+                "id": it.id,
+                "title": it.title,
+                "question": it.question,
+                "ok": False,
+                "stop_reason": rr.stop_reason,
+                "attempts_used": len(rr.attempts),
+                # plain dicts now: the returned logs are JSON-ready and hold no AttemptRecord trees
+                "attempts": [asdict(a) for a in rr.attempts],
+            })
+            continue
 
-
-def _json_safe(obj: Any) -> Any:
-    if obj is None or isinstance(obj, (str, int, float, bool)):
-        return obj
-    if isinstance(obj, tuple):
-        return [_json_safe(x) for x in obj]
-    if isinstance(obj, list):
-        return [_json_safe(x) for x in obj]
-    if isinstance(obj, dict):
-        return {str(k): _json_safe(v) for k, v in obj.items()}
-    if hasattr(obj, "__dict__"):
-        return _json_safe(obj.__dict__.copy())
-    return str(obj)
+        sql = rr.final_sql or ""
+        cols = rr.columns or ()
+        rows = rr.rows or []
+        logs.append({
+            "id": it.id,
+            "title": it.title,
+            "question": it.question,
+            "ok": True,
+            "stop_reason": rr.stop_reason,
+            "attempts_used": len(rr.attempts),
+            "sql": sql,
+            "columns": list(cols),
+            "row_count": len(rows),
+        })
+    return logs
 
 
 def run_and_report(
@@ -81,106 +173,74 @@ def run_and_report(
         report_items = list(items)  # type: ignore[arg-type]
 
     policy = SQLPolicy()
-    svc = SchemaService(cfg.db_path)
 
-    gen_cfg = GenerationConfig(
-        model_name=cfg.model_name,
+    # Shared across calls; the model (and torch) is only loaded on the first SQL-cache miss.
+    gen = get_generator(
+        cfg.db_path,
+        cfg.model_name,
         max_new_tokens=cfg.max_new_tokens,
         do_sample=False,
     )
+    sql_cache = None
+    if cfg.sql_cache_path and not cfg.no_cache:
+        Path(cfg.sql_cache_path).parent.mkdir(parents=True, exist_ok=True)
+        sql_cache = SQLCache(cfg.sql_cache_path)
+
+    # Each worker thread gets its own executor (SQLite connection) and runner;
+    # the generator and SQL cache are shared and lock internally.
+    local = threading.local()
+    executors: List[QueryExecutor] = []
+
+    def run_question(question: str) -> RetryResult:
+        runner = getattr(local, "runner", None)
+        if runner is None:
+            executor = QueryExecutor(cfg.db_path, timeout_ms=cfg.timeout_ms, max_rows=cfg.max_rows)
+            executors.append(executor)
+            runner = RetryRunner(
+                gen, executor, policy=policy, max_attempts=cfg.max_attempts, stop_on_repeat_sql=True, sql_cache=sql_cache
+            )
+            local.runner = runner
+        return runner.run(question)
+
+    questions = [it.question for it in report_items]
+    results: List[Optional[RetryResult]] = [None] * len(questions)
+
+    # SQL-cache hits are executed up front as one batch on a single connection.
+    if sql_cache is not None:
+        batch_executor = QueryExecutor(cfg.db_path, timeout_ms=cfg.timeout_ms, max_rows=cfg.max_rows)
+        executors.append(batch_executor)
+        batch_runner = RetryRunner(
+            gen, batch_executor, policy=policy, max_attempts=cfg.max_attempts, stop_on_repeat_sql=True, sql_cache=sql_cache
+        )
+        results = batch_runner.run_cached_many(questions)
 
-    gen = SQLGenerator(svc, gen_cfg)
-    executor = QueryExecutor(cfg.db_path, timeout_ms=cfg.timeout_ms, max_rows=cfg.max_rows)
-    runner = RetryRunner(gen, executor, policy=policy, max_attempts=cfg.max_attempts, stop_on_repeat_sql=True)
-
-    md_blocks: List[str] = []
-    logs: List[Dict[str, Any]] = []
-
-    md_blocks.append(f"# {cfg.report_title}")
-    md_blocks.append("")
-    md_blocks.append("## Executive summary")
-    md_blocks.append(f"- Database: `{cfg.db_path}`")
-    md_blocks.append(f"- Retry cap: {cfg.max_attempts}")
-    md_blocks.append(f"- Read-only execution: enabled")
-    md_blocks.append("")
-
-    ok_count = 0
-
-    for it in report_items:
-        rr: RetryResult = runner.run(it.question)
-
-        md_blocks.append(f"## {it.title}")
-        md_blocks.append("")
-        md_blocks.append(f"**Question:** {it.question}")
-        md_blocks.append("")
-
-        if not rr.ok:
-            md_blocks.append(f"**Status:** FAILED ({rr.stop_reason})")
-            md_blocks.append("")
-            if rr.attempts:
-                last = rr.attempts[-1]
-                md_blocks.append("**Last attempted SQL (best effort):**")
-                md_blocks.append("```sql")
-                md_blocks.append(((last.rewritten_sql or last.sql_clean) or "").strip())
-                md_blocks.append("```")
-                if last.error_feedback:
-                    md_blocks.append("**Error:**")
-                    md_blocks.append(f"- Category: {last.error_feedback.category}")
-                    md_blocks.append(f"- Message: {last.error_feedback.message}")
-            md_blocks.append("")
-
-            logs.append({
-                "id": it.id,
-                "title": it.title,
-                "question": it.question,
-                "ok": False,
-                "stop_reason": rr.stop_reason,
-                "attempts_used": len(rr.attempts),
-                "attempts": rr.attempts,  # keep rich objects, will be _json_safe()’d at write time
-            })
-            continue
-
-        ok_count += 1
-
-        sql = rr.final_sql or ""
-        cols = rr.columns or ()
-        rows = rr.rows or []
-
-        md_blocks.append("**SQL:**")
-        md_blocks.append("```sql")
-        md_blocks.append(sql.strip())
-        md_blocks.append("```")
-        md_blocks.append("")
-
-        ts = summarize_table(cols, rows, title="Table summary")
-        md_blocks.append(render_summary_markdown(ts))
-        md_blocks.append("")
-        md_blocks.append("**Preview:**")
-        md_blocks.append("")
-        md_blocks.append(render_markdown_table(cols, rows, max_rows=cfg.preview_rows))
-        md_blocks.append("")
-
-        logs.append({
-            "id": it.id,
-            "title": it.title,
-            "question": it.question,
-            "ok": True,
-            "stop_reason": rr.stop_reason,
-            "attempts_used": len(rr.attempts),
-            "sql": sql,
-            "columns": list(cols),
-            "row_count": len(rows),
-        })
-
-    md_blocks.insert(
-        5,
-        f"- Successful queries: {ok_count}/{len(report_items)}"
-    )
-
-    # Write outputs
     out_path = Path(out_dir) if out_dir else None
-    md_text = "\n".join(md_blocks)
+    sections: List[str] = []
+    # Declared column types let the summarizer skip type sampling for known numeric columns.
+    known_types = gen.schema_service.column_type_hints() if out_path else None
+
+    # Remaining questions run concurrently. Pipelined: this thread summarizes and
+    # renders each section, in input order, as soon as its result is ready, while
+    # later questions are still generating (GPU) or executing (SQLite) on the pool.
+    pending = [i for i, rr in enumerate(results) if rr is None]
+    workers = cfg.workers or min(8, len(pending)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {i: pool.submit(run_question, questions[i]) for i in pending}
+        for i, it in enumerate(report_items):
+            if results[i] is None:
+                results[i] = futures[i].result()
+            if out_path:
+                sections.append("\n".join(_render_item(cfg, it, results[i], known_types)))
+
+    for executor in executors:
+        executor.close()
+    if sql_cache is not None:
+        sql_cache.close()
+
+    ok_count = sum(1 for rr in results if rr.ok)
+    logs = _run_logs(report_items, results)
 
+    # Write outputs
     md_file = None
     json_file = None
 
@@ -189,8 +249,12 @@ def run_and_report(
         md_file = out_path / "report.md"
         json_file = out_path / "run_log.json"
 
-        md_file.write_text(md_text, encoding="utf-8")
-        json_file.write_text(json.dumps(_json_safe(logs), indent=2), encoding="utf-8")
+        write_lines(md_file, chain(_render_header(cfg, len(report_items), ok_count), sections), durable=cfg.durable)
+        write_bytes(
+            json_file,
+            [orjson.dumps(logs, default=json_default, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)],
+            durable=cfg.durable,
+        )
 
     return {
         "ok": ok_count == len(report_items),
@@ -0,0 +1,124 @@
+# src/eval_fast.py
+"""
+Per-trial helpers of the eval harness (hashing, SQL normalization, expectation checks).
+
+Kept free of heavy imports and fully annotated so the module can be compiled
+with mypyc (`mypyc src/eval_fast.py`) for a C-extension build; the pure-Python
+module is used as-is when no compiled build is present.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+
+def fast_hash(s: str) -> str:
+    # Non-cryptographic use (in-process fingerprints), so a short BLAKE2b digest is plenty.
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def fast_hash_int(s: str) -> int:
+    # Same 64-bit digest as fast_hash, as an int: cheaper dict/set keys than hex strings.
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def fingerprint_result(columns: Tuple[str, ...], rows: List[Tuple[Any, ...]]) -> str:
+    # Stream rows into the hasher instead of building a JSON copy of the whole table.
+    h = hashlib.blake2b(digest_size=8)
+    h.update(repr(tuple(columns)).encode("utf-8"))
+    for r in rows:
+        h.update(repr(tuple(r)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def norm_sql(sql: str) -> str:
+    return " ".join((sql or "").split()).strip().upper()
+
+
+def sql_fingerprint(sql: str) -> Tuple[str, str]:
+    """
+    (normalized SQL, its fast_hash), computed once per SQL string.
+    """
+    n = norm_sql(sql)
+    return n, fast_hash(n)
+
+
+@dataclass(frozen=True)
+class PreparedExpect:
+    # (fragment as written, uppercased fragment)
+    contains: Tuple[Tuple[str, str], ...]
+    not_contains: Tuple[Tuple[str, str], ...]
+    regex: Optional[Pattern[str]]
+
+
+def prepare_expect(expect: Dict[str, Any]) -> PreparedExpect:
+    """
+    Uppercases fragments and compiles sql_regex once per case instead of once per trial.
+    """
+    sql_regex = expect.get("sql_regex")
+    return PreparedExpect(
+        contains=tuple((f, f.upper()) for f in expect.get("sql_contains", [])),
+        not_contains=tuple((f, f.upper()) for f in expect.get("sql_not_contains", [])),
+        regex=re.compile(sql_regex, re.IGNORECASE | re.DOTALL) if sql_regex else None,
+    )
+
+
+def check_sql_expectations(sql: str, expect: Any) -> Tuple[bool, List[str]]:
+    """
+    expect: the case's raw "expect" dict, or its prepare_expect() result.
+    """
+    if not isinstance(expect, PreparedExpect):
+        expect = prepare_expect(expect)
+
+    reasons: List[str] = []
+    s = (sql or "")
+    u = s.upper()
+
+    ok = True
+
+    for frag, frag_u in expect.contains:
+        if frag_u not in u:
+            ok = False
+            reasons.append(f"sql_missing:{frag}")
+
+    if expect.regex is not None:
+        if not expect.regex.search(s):
+            ok = False
+            reasons.append("sql_regex_no_match")
+
+    for frag, frag_u in expect.not_contains:
+        if frag_u in u:
+            ok = False
+            reasons.append(f"sql_forbidden_contains:{frag}")
+
+    return ok, reasons
+
+
+def check_result_properties(columns: Tuple[str, ...], row_count: int, props: Dict[str, Any]) -> Tuple[bool, List[str]]:
+    reasons: List[str] = []
+    ok = True
+
+    cols = [c.lower() for c in columns]
+
+    cols_need = [c.lower() for c in props.get("columns_contains", [])]
+    for c in cols_need:
+        if c not in cols:
+            ok = False
+            reasons.append(f"missing_column:{c}")
+
+    n = row_count
+    if "row_count_equals" in props and n != int(props["row_count_equals"]):
+        ok = False
+        reasons.append(f"row_count_not_equal:{n}")
+
+    if "min_rows" in props and n < int(props["min_rows"]):
+        ok = False
+        reasons.append(f"min_rows_failed:{n}")
+
+    if "max_rows" in props and n > int(props["max_rows"]):
+        ok = False
+        reasons.append(f"max_rows_failed:{n}")
+
+    return ok, reasons
@@ -0,0 +1,111 @@
+# src/lazy_generator.py
+from __future__ import annotations
+
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from src.schema_service import SchemaService
+from src.sql_policy import SQLPolicy
+
+if TYPE_CHECKING:
+    from src.sql_generator import GenerationResult, SQLGenerator
+
+
+class LazySQLGenerator:
+    """
+    Stand-in for SQLGenerator that imports src.sql_generator (torch/transformers)
+    and loads the model on the first generate call. RetryRunner only needs
+    schema_service / model_name for its cache key, so a report answered entirely
+    from the SQL cache never pays for the import or the model load.
+    A failed import or load is remembered and re-raised on later calls.
+    """
+
+    def __init__(self, schema_service: SchemaService, *, model_name: str, **gen_kwargs: Any):
+        self.schema_service = schema_service
+        self.model_name = model_name
+        self._gen_kwargs = gen_kwargs
+        self._gen: Optional[SQLGenerator] = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._gen is not None
+
+    def get(self) -> SQLGenerator:
+        with self._lock:
+            if self._gen is None:
+                if self._error is not None:
+                    raise self._error
+                try:
+                    from src.sql_generator import GenerationConfig, SQLGenerator
+
+                    cfg = GenerationConfig(model_name=self.model_name, **self._gen_kwargs)
+                    self._gen = SQLGenerator(self.schema_service, cfg)
+                except Exception as e:
+                    # a failed multi-GB load is not retried for every question
+                    self._error = e
+                    raise
+            return self._gen
+
+    def generate_sql(
+        self,
+        question: str,
+        policy: Optional[SQLPolicy] = None,
+        error_context: Optional[str] = None,
+    ) -> GenerationResult:
+        return self.get().generate_sql(question, policy=policy, error_context=error_context)
+
+    def generate_sql_batch(self, questions: List[str], policy: Optional[SQLPolicy] = None) -> List[GenerationResult]:
+        return self.get().generate_sql_batch(questions, policy=policy)
+
+
+# ----------------------------
+# Process-wide instances
+# ----------------------------
+
+# Repeated programmatic runs (notebooks, web handlers) reuse the loaded model
+# and schema instead of paying the cold start on every call.
+_SVC_CACHE: Dict[str, Tuple[int, SchemaService]] = {}
+_GEN_CACHE: Dict[Tuple[Any, ...], LazySQLGenerator] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def get_schema_service(db_path: str) -> SchemaService:
+    """
+    Shared SchemaService for db_path. Reloaded when the file's mtime changes,
+    so a rebuilt database is never served with the old schema.
+    """
+    mtime = os.stat(db_path).st_mtime_ns
+    with _CACHE_LOCK:
+        hit = _SVC_CACHE.get(db_path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        svc = hit[1] if hit is not None else SchemaService(db_path)
+        if hit is not None:
+            svc.refresh()
+        _SVC_CACHE[db_path] = (mtime, svc)
+        return svc
+
+
+def get_generator(db_path: str, model_name: str, **gen_kwargs: Any) -> LazySQLGenerator:
+    """
+    Shared LazySQLGenerator per (db_path, model_name, decoding settings).
+    The model itself is still only loaded on first use.
+    """
+    svc = get_schema_service(db_path)
+    key = (db_path, model_name, tuple(sorted(gen_kwargs.items())))
+    with _CACHE_LOCK:
+        gen = _GEN_CACHE.get(key)
+        if gen is None:
+            gen = LazySQLGenerator(svc, model_name=model_name, **gen_kwargs)
+            _GEN_CACHE[key] = gen
+        return gen
+
+
+def clear_cache() -> None:
+    """Drop the shared schema services and generators (releases loaded models)."""
+    with _CACHE_LOCK:
+        _SVC_CACHE.clear()
+        _GEN_CACHE.clear()
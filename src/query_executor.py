@@ -1,10 +1,12 @@
 # src/query_executor.py
 from __future__ import annotations
 
+import hashlib
 import sqlite3
+import threading
 import time
 from dataclasses import dataclass
-from typing import Any, List, Tuple, Optional
+from typing import Any, Iterable, Iterator, List, Tuple, Optional, Union
 
 
 # ----------------------------
@@ -39,6 +41,19 @@ class ExecutionResult:
     execution_time_ms: int
 
 
+@dataclass(frozen=True)
+class ResultSummary:
+    """
+    Streaming alternative to ExecutionResult: rows are hashed and counted,
+    only the first few are kept.
+    """
+    columns: Tuple[str, ...]
+    row_count: int
+    fingerprint: str
+    preview: List[Tuple[Any, ...]]
+    execution_time_ms: int
+
+
 # ----------------------------
 # Executor
 # ----------------------------
@@ -59,36 +74,80 @@ class QueryExecutor:
         self.db_path = db_path
         self.timeout_ms = timeout_ms
         self.max_rows = max_rows
+        # One persistent read-only connection per (executor, thread).
+        self._tls = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
 
     def _connect_readonly(self) -> sqlite3.Connection:
-        uri = f"file:{self.db_path}?mode=ro"
-        conn = sqlite3.connect(uri, uri=True)
-        conn.row_factory = sqlite3.Row
+        # Connection setup and SQLite's page cache are paid for once per thread
+        # instead of per query. (journal_mode cannot be changed on a mode=ro
+        # connection, so it is left as is.)
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            uri = f"file:{self.db_path}?mode=ro"
+            # check_same_thread=False only so close() can close every thread's connection.
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            # No row_factory: rows come back from the C layer as plain tuples.
+
+            # SQLite timeout (best effort)
+            conn.execute(f"PRAGMA busy_timeout = {self.timeout_ms}")
+            conn.execute("PRAGMA query_only = 1")
+            conn.execute("PRAGMA mmap_size = 268435456")
+            conn.execute("PRAGMA cache_size = -65536")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            self._tls.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
         return conn
 
+    def close(self) -> None:
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        # A fresh thread-local namespace drops every thread's cached handle.
+        self._tls = threading.local()
+
+    def _arm_timeout(self, conn: sqlite3.Connection, start: int) -> None:
+        # Checked every 1000 VDBE instructions, during both execute() and the
+        # row fetches, so a runaway query is interrupted instead of timed after
+        # the fact. A non-zero return makes SQLite abort with "interrupted".
+        deadline = start + self.timeout_ms * 1_000_000
+        conn.set_progress_handler(lambda: time.perf_counter_ns() > deadline, 1000)
+
+    def _sqlite_error(self, e: sqlite3.Error, start: int) -> QueryExecutionError:
+        elapsed_ns = time.perf_counter_ns() - start
+        if isinstance(e, sqlite3.OperationalError) and elapsed_ns > self.timeout_ms * 1_000_000:
+            exec_ms = elapsed_ns // 1_000_000
+            return TimeoutExceeded(f"timeout_exceeded: {exec_ms}ms > {self.timeout_ms}ms")
+        return SQLiteExecutionError(str(e))
+
     def execute(self, sql: str) -> ExecutionResult:
-        start = time.time()
+        start = time.perf_counter_ns()  # monotonic, integer ns
+        conn = None
+        cur = None
 
         try:
             conn = self._connect_readonly()
+            self._arm_timeout(conn, start)
             cur = conn.cursor()
 
-            # SQLite timeout (best effort)
-            conn.execute(f"PRAGMA busy_timeout = {self.timeout_ms}")
-
             cur.execute(sql)
 
-            rows: List[Tuple[Any, ...]] = []
-            for row in cur:
-                rows.append(tuple(row))
-                if len(rows) > self.max_rows:
-                    raise RowLimitExceeded(
-                        f"row_limit_exceeded: {len(rows)} > {self.max_rows}"
-                    )
+            # One C-level fetch of at most max_rows + 1 rows; a single length
+            # check replaces the per-row check.
+            batch = cur.fetchmany(self.max_rows + 1)
+            if len(batch) > self.max_rows:
+                raise RowLimitExceeded(
+                    f"row_limit_exceeded: {len(batch)} > {self.max_rows}"
+                )
+            # Already plain tuples (no row_factory): callers hash, cache and JSON-serialize them.
+            rows: List[Tuple[Any, ...]] = batch
 
             columns = tuple([d[0] for d in cur.description]) if cur.description else ()
 
-            exec_ms = int((time.time() - start) * 1000)
+            exec_ms = (time.perf_counter_ns() - start) // 1_000_000
 
             if exec_ms > self.timeout_ms:
                 raise TimeoutExceeded(
@@ -105,9 +164,86 @@ class QueryExecutor:
         except QueryExecutionError:
             raise
         except sqlite3.Error as e:
-            raise SQLiteExecutionError(str(e))
+            raise self._sqlite_error(e, start)
         finally:
+            if cur is not None:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+            if conn is not None:
+                conn.set_progress_handler(None, 0)
+
+    def execute_many(self, sqls: Iterable[str]) -> Iterator[Union[ExecutionResult, QueryExecutionError]]:
+        """
+        Runs each statement in order on this thread's single connection, so the
+        page cache, schema cache and pragmas are warmed once for the batch.
+        A failing statement yields its QueryExecutionError instead of raising,
+        and the rest of the batch still runs.
+        """
+        for sql in sqls:
             try:
-                conn.close()
-            except Exception:
-                pass
+                yield self.execute(sql)
+            except QueryExecutionError as e:
+                yield e
+
+    def execute_streaming(self, sql: str, *, preview_rows: int = 20) -> ResultSummary:
+        """
+        Like execute(), but never materializes the result. The fingerprint is a
+        BLAKE2b-64 over repr(columns) then repr(row) for each row, matching
+        fingerprint_result() in src/eval_fast.py.
+        """
+        start = time.perf_counter_ns()  # monotonic, integer ns
+        conn = None
+        cur = None
+
+        try:
+            conn = self._connect_readonly()
+            self._arm_timeout(conn, start)
+            cur = conn.cursor()
+
+            cur.execute(sql)
+
+            columns = tuple([d[0] for d in cur.description]) if cur.description else ()
+            h = hashlib.blake2b(digest_size=8)
+            h.update(repr(columns).encode("utf-8"))
+
+            preview: List[Tuple[Any, ...]] = []
+            n = 0
+            for row in cur:
+                n += 1
+                if n > self.max_rows:
+                    raise RowLimitExceeded(
+                        f"row_limit_exceeded: {n} > {self.max_rows}"
+                    )
+                h.update(repr(row).encode("utf-8"))
+                if n <= preview_rows:
+                    preview.append(row)
+
+            exec_ms = (time.perf_counter_ns() - start) // 1_000_000
+
+            if exec_ms > self.timeout_ms:
+                raise TimeoutExceeded(
+                    f"timeout_exceeded: {exec_ms}ms > {self.timeout_ms}ms"
+                )
+
+            return ResultSummary(
+                columns=columns,
+                row_count=n,
+                fingerprint=h.hexdigest(),
+                preview=preview,
+                execution_time_ms=exec_ms,
+            )
+
+        except QueryExecutionError:
+            raise
+        except sqlite3.Error as e:
+            raise self._sqlite_error(e, start)
+        finally:
+            if cur is not None:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+            if conn is not None:
+                conn.set_progress_handler(None, 0)
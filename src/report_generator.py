@@ -2,15 +2,21 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
 
-from src.schema_service import SchemaService
-from src.sql_generator import SQLGenerator, GenerationConfig
 from src.sql_policy import SQLPolicy
 from src.query_executor import QueryExecutor
+from src.lazy_generator import get_generator, get_schema_service
 from src.retry_logic import RetryRunner, RetryResult
+from src.sql_cache import SQLCache
+from src.report_io import json_default, write_bytes, write_lines
 from src.summarizer import summarize_table, render_markdown_table, render_summary_markdown
 
 
@@ -28,6 +34,9 @@ class ReportConfig:
     queries: Tuple[ReportQuery, ...]
     max_attempts: int = 3
     table_preview_rows: int = 15
+    sql_cache_path: Optional[str] = None
+    workers: Optional[int] = None  # None -> min(8, number of queries)
+    durable: bool = False  # fsync the report files before returning
 
 
 def load_report_config(path: str) -> ReportConfig:
@@ -42,105 +51,133 @@ def load_report_config(path: str) -> ReportConfig:
         queries=queries,
         max_attempts=int(obj.get("max_attempts", 3)),
         table_preview_rows=int(obj.get("table_preview_rows", 15)),
+        sql_cache_path=obj.get("sql_cache_path"),
+        workers=int(obj["workers"]) if obj.get("workers") is not None else None,
+        durable=bool(obj.get("durable", False)),
     )
-def normalize_question(q: str) -> str:
-    # deterministic alias mapping
-    aliases = {
-        "California": "CA",
-        "New York": "NY",
-        "Washington": "WA",
-    }
-    for full, abbr in aliases.items():
-        q = q.replace(full, abbr)
-    return q
-def _json_safe(obj):
-    # Converts nested dataclasses / tuples / custom objects into JSON-safe structures.
-    if obj is None or isinstance(obj, (str, int, float, bool)):
-        return obj
-    if isinstance(obj, tuple):
-        return [_json_safe(x) for x in obj]
-    if isinstance(obj, list):
-        return [_json_safe(x) for x in obj]
-    if isinstance(obj, dict):
-        return {str(k): _json_safe(v) for k, v in obj.items()}
-
-    # dataclass-like objects (AttemptRecord, ErrorFeedback) expose __dict__
-    if hasattr(obj, "__dict__"):
-        d = obj.__dict__.copy()
-        return _json_safe(d)
-
-    # last resort
-    return str(obj)
 
 
-def generate_report_markdown(cfg: ReportConfig) -> Tuple[str, List[Dict[str, Any]]]:
-    policy = SQLPolicy()
-    svc = SchemaService(cfg.db_path)
-    gen = SQLGenerator(svc, GenerationConfig(max_new_tokens=256, do_sample=False))
-    executor = QueryExecutor(cfg.db_path, timeout_ms=2000, max_rows=1000)
-    runner = RetryRunner(gen, executor, max_attempts=cfg.max_attempts, stop_on_repeat_sql=True)
+# deterministic alias mapping
+_ALIASES = {
+    "California": "CA",
+    "New York": "NY",
+    "Washington": "WA",
+}
+# Longest alias first, so a longer name wins over any alias that is its prefix.
+_ALIAS_RE = re.compile("|".join(re.escape(k) for k in sorted(_ALIASES, key=len, reverse=True)))
 
-    blocks: List[str] = []
-    logs: List[Dict[str, Any]] = []
-
-    blocks.append(f"# {cfg.report_title}")
-    blocks.append("")
-    blocks.append("## Executive summary")
-    blocks.append("- This report was generated automatically from the SQLite analytics database.")
-    blocks.append(f"- Retry cap: {cfg.max_attempts}. Deterministic generation: enabled.")
-    blocks.append("")
 
-    for rq in cfg.queries:
-        rr = runner.run(normalize_question(rq.question))
+def normalize_question(q: str) -> str:
+    # one scan over q instead of one str.replace pass per alias
+    return _ALIAS_RE.sub(lambda m: _ALIASES[m.group(0)], q)
 
 
-        blocks.append(f"## {rq.title}")
-        blocks.append("")
-        blocks.append(f"**Question:** {rq.question}")
-        blocks.append("")
+def _run_queries(cfg: ReportConfig) -> List[RetryResult]:
+    policy = SQLPolicy()
+    # Shared across calls and loaded on the first SQL-cache miss; all-hit runs never import torch.
+    gen = get_generator(cfg.db_path, "Qwen/Qwen2.5-Coder-7B-Instruct", max_new_tokens=256, do_sample=False)
+    sql_cache = None
+    if cfg.sql_cache_path:
+        Path(cfg.sql_cache_path).parent.mkdir(parents=True, exist_ok=True)
+        sql_cache = SQLCache(cfg.sql_cache_path)
+
+    # Per-thread executor + runner; generator and SQL cache are shared.
+    local = threading.local()
+    executors: List[QueryExecutor] = []
+
+    def run_query(rq: ReportQuery) -> RetryResult:
+        runner = getattr(local, "runner", None)
+        if runner is None:
+            executor = QueryExecutor(cfg.db_path, timeout_ms=2000, max_rows=1000)
+            executors.append(executor)
+            runner = RetryRunner(gen, executor, max_attempts=cfg.max_attempts, stop_on_repeat_sql=True, sql_cache=sql_cache)
+            local.runner = runner
+        return runner.run(normalize_question(rq.question))
+
+    workers = cfg.workers or min(8, len(cfg.queries)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results: List[RetryResult] = list(pool.map(run_query, cfg.queries))
+
+    for executor in executors:
+        executor.close()
+    if sql_cache is not None:
+        sql_cache.close()
+
+    return results
+
+
+def _render(cfg: ReportConfig, results: List[RetryResult]) -> Iterator[str]:
+    """
+    Report markdown, one line (or pre-rendered block) at a time.
+    """
+    yield f"# {cfg.report_title}"
+    yield ""
+    yield "## Executive summary"
+    yield "- This report was generated automatically from the SQLite analytics database."
+    yield f"- Retry cap: {cfg.max_attempts}. Deterministic generation: enabled."
+    yield ""
+
+    # Declared column types let the summarizer skip type sampling for known numeric columns.
+    known_types = get_schema_service(cfg.db_path).column_type_hints()
+
+    for rq, rr in zip(cfg.queries, results):
+        yield f"## {rq.title}"
+        yield ""
+        yield f"**Question:** {rq.question}"
+        yield ""
 
         if not rr.ok:
-            blocks.append(f"**Status:** FAILED ({rr.stop_reason})")
-            blocks.append("")
+            yield f"**Status:** FAILED ({rr.stop_reason})"
+            yield ""
             if rr.attempts:
                 last = rr.attempts[-1]
-                blocks.append("**Last attempted SQL (best effort):**")
-                blocks.append("```sql")
-                blocks.append((last.rewritten_sql or last.sql_clean or "").strip())
-                blocks.append("```")
+                yield "**Last attempted SQL (best effort):**"
+                yield "```sql"
+                yield (last.rewritten_sql or last.sql_clean or "").strip()
+                yield "```"
                 if last.error_feedback:
-                    blocks.append("**Error:**")
-                    blocks.append(f"- Category: {last.error_feedback.category}")
-                    blocks.append(f"- Message: {last.error_feedback.message}")
-            blocks.append("")
+                    yield "**Error:**"
+                    yield f"- Category: {last.error_feedback.category}"
+                    yield f"- Message: {last.error_feedback.message}"
+            yield ""
+            continue
+
+        sql = rr.final_sql or ""
+        cols = rr.columns or ()
+        rows = rr.rows or []
+
+        yield "**SQL:**"
+        yield "```sql"
+        yield sql.strip()
+        yield "```"
+        yield ""
+
+        ts = summarize_table(cols, rows, title="Table summary", known_types=known_types)
+        yield render_summary_markdown(ts)
+        yield ""
+        yield "**Preview:**"
+        yield ""
+        yield render_markdown_table(cols, rows, max_rows=cfg.table_preview_rows)
+        yield ""
+
+
+def _run_logs(cfg: ReportConfig, results: List[RetryResult]) -> List[Dict[str, Any]]:
+    logs: List[Dict[str, Any]] = []
+    for rq, rr in zip(cfg.queries, results):
+        if not rr.ok:
             logs.append({
                 "id": rq.id,
                 "title": rq.title,
                 "question": rq.question,
                 "ok": False,
                 "stop_reason": rr.stop_reason,
-                "attempts": [a.__dict__ for a in rr.attempts],
+                "attempts": [asdict(a) for a in rr.attempts],
             })
             continue
 
         sql = rr.final_sql or ""
         cols = rr.columns or ()
         rows = rr.rows or []
-
-        blocks.append("**SQL:**")
-        blocks.append("```sql")
-        blocks.append(sql.strip())
-        blocks.append("```")
-        blocks.append("")
-
-        ts = summarize_table(cols, rows, title="Table summary")
-        blocks.append(render_summary_markdown(ts))
-        blocks.append("")
-        blocks.append("**Preview:**")
-        blocks.append("")
-        blocks.append(render_markdown_table(cols, rows, max_rows=cfg.table_preview_rows))
-        blocks.append("")
-
         logs.append({
             "id": rq.id,
             "title": rq.title,
@@ -152,8 +189,12 @@ def generate_report_markdown(cfg: ReportConfig) -> Tuple[str, List[Dict[str, Any
             "columns": list(cols),
             "attempts_used": len(rr.attempts),
         })
+    return logs
 
-    return "\n".join(blocks), logs
+
+def generate_report_markdown(cfg: ReportConfig) -> Tuple[str, List[Dict[str, Any]]]:
+    results = _run_queries(cfg)
+    return "\n".join(_render(cfg, results)), _run_logs(cfg, results)
 
 
 def write_report(cfg_path: str, out_dir: str = "reports/mock_team") -> None:
@@ -161,13 +202,23 @@ def write_report(cfg_path: str, out_dir: str = "reports/mock_team") -> None:
     out = Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
 
-    md, logs = generate_report_markdown(cfg)
+    results = _run_queries(cfg)
 
     md_path = out / "report.md"
-    md_path.write_text(md, encoding="utf-8")
+    write_lines(md_path, _render(cfg, results), durable=cfg.durable)
 
     log_path = out / "report_run.json"
-    log_path.write_text(json.dumps(_json_safe(logs), indent=2), encoding="utf-8")
+    write_bytes(
+        log_path,
+        [
+            orjson.dumps(
+                _run_logs(cfg, results),
+                default=json_default,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+            )
+        ],
+        durable=cfg.durable,
+    )
 
 
     print(f"Wrote: {md_path}")
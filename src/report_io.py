@@ -0,0 +1,37 @@
+# src/report_io.py
+from __future__ import annotations
+
+import os
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+
+def json_default(obj: Any) -> Any:
+    # default= hook for orjson (which serializes dataclasses itself) and json.dumps
+    # (which does not): dataclasses first, then plain objects, then str().
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    if hasattr(obj, "__dict__"):
+        return obj.__dict__
+    return str(obj)
+
+
+def write_lines(path: Path, lines: Iterable[str], *, durable: bool = False) -> None:
+    # "\n".join(lines) as UTF-8, without building the joined string. Encoded
+    # bytes go straight into one 1 MiB buffer, so a typical report is a single write().
+    def chunks() -> Iterator[bytes]:
+        for i, line in enumerate(lines):
+            yield (("\n" + line) if i else line).encode("utf-8")
+
+    write_bytes(path, chunks(), durable=durable)
+
+
+def write_bytes(path: Path, chunks: Iterable[bytes], *, durable: bool = False) -> None:
+    with path.open("wb", buffering=1 << 20) as f:
+        for chunk in chunks:
+            f.write(chunk)
+        if durable:
+            # Opt-in: fsync costs far more than the write itself for small reports.
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,97 @@
+# src/result_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def result_cache_key(
+    question: str,
+    schema_version: str,
+    policy: Any,
+    gen_cfg: Any,
+    mode: str = "",
+) -> str:
+    # Frozen dataclass reprs are deterministic, so they double as policy / decoding hashes.
+    payload = f"{question}|{schema_version}|{policy!r}|{gen_cfg!r}|{mode}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Minimal in-process LRU map. Not thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key: Any) -> Optional[Any]:
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key: Any, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ResultCache:
+    """
+    Exact-match cache of evaluated outcomes (SQL, columns, rows, fingerprint).
+    In-memory LRU in front of an optional SQLite sidecar file, so separate
+    invocations share hits. Values must be JSON-serializable dicts.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: Optional[str] = None, *, max_entries: int = 1024):
+        self.path = path
+        self._lru = LRUCache(max_entries)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS result_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None or self._conn is None:
+                return value
+
+            row = self._conn.execute("SELECT value FROM result_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value = json.loads(row[0])
+            self._lru.put(key, value)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._lru.put(key, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO result_cache (key, value) VALUES (?, ?)",
+                    (key, json.dumps(value, default=str)),
+                )
+                self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
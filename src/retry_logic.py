@@ -4,7 +4,7 @@ from __future__ import annotations
 import json
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from src.sql_policy import SQLPolicy
 from src.sql_validator import validate_sql, ValidationDecision
@@ -16,14 +16,19 @@ from src.query_executor import (
     TimeoutExceeded,
     RowLimitExceeded,
 )
-from src.sql_generator import SQLGenerator, GenerationResult
+from src.eval_fast import fast_hash_int, norm_sql
+from src.result_cache import LRUCache
+
+if TYPE_CHECKING:
+    # Annotations only: importing src.sql_generator pulls in torch/transformers.
+    from src.sql_generator import SQLGenerator, GenerationResult
 
 
 # ----------------------------
 # Error feedback taxonomy
 # ----------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ErrorFeedback:
     category: str  # "validation" | "sqlite" | "timeout" | "row_limit" | "unknown"
     message: str
@@ -50,11 +55,23 @@ def _feedback_from_exception(e: Exception) -> ErrorFeedback:
     return ErrorFeedback(category="unknown", message=str(e), details={})
 
 
+# Shape of json.dumps(payload, ensure_ascii=False) for the retry feedback block.
+_ERROR_CONTEXT_TEMPLATE = (
+    '{"attempt": %d, "previous_sql": %s, '
+    '"error": {"category": %s, "message": %s, "details": %s}, '
+    '"instruction": "Fix the SQL. Use only schema columns. Output SQL only."}'
+)
+
+
+def _json_str(s: Optional[str]) -> str:
+    return "null" if s is None else json.dumps(s, ensure_ascii=False)
+
+
 # ----------------------------
 # Attempt log (for convergence proofs)
 # ----------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AttemptRecord:
     attempt: int
     sql_raw: str
@@ -87,43 +104,170 @@ class RetryRunner:
 
     def __init__(
         self,
-        generator: SQLGenerator,
+        generator: SQLGenerator,  # or LazySQLGenerator
         executor: QueryExecutor,
         *,
         policy: Optional[SQLPolicy] = None,
         max_attempts: int = 3,
         stop_on_repeat_sql: bool = True,
+        cache_size: int = 0,
+        sql_cache: Optional[Any] = None,
     ):
+        """
+        cache_size > 0 enables two in-process LRU caches keyed by
+        (question, db_path, schema_version, model_name):
+          - results: successful RetryResults, returned as-is on a repeat question
+          - sql: validated final SQL, re-executed (no generate/validate/rewrite)
+            when the result itself has been evicted; SQL strings are small, so
+            this one keeps 8x as many entries
+        sql_cache: optional persistent store for the SQL level (e.g. SQLCache);
+        anything with get(key) / put(key, sql) / delete(key) works. Cached SQL
+        that no longer validates or executes is deleted, so it is tried once.
+        """
         self.generator = generator
         self.executor = executor
         self.policy = policy or SQLPolicy()
         self.max_attempts = max_attempts
         self.stop_on_repeat_sql = stop_on_repeat_sql
+        self._result_cache: Optional[LRUCache] = LRUCache(cache_size) if cache_size > 0 else None
+        self._sql_cache: Optional[Any] = sql_cache
+        if self._sql_cache is None and cache_size > 0:
+            self._sql_cache = LRUCache(8 * cache_size)
+
+    def _cache_key(self, question: str) -> Tuple[str, str, str, str]:
+        return (
+            " ".join(question.split()),
+            self.executor.db_path,
+            self.generator.schema_service.schema_version(),
+            self.generator.model_name,
+        )
+
+    def run(self, question: str, *, first_generation: Optional[GenerationResult] = None) -> RetryResult:
+        """
+        first_generation: optional precomputed attempt-1 output (e.g. from
+        SQLGenerator.generate_sql_batch) used instead of generating it here.
+        """
+        if self._result_cache is None and self._sql_cache is None:
+            return self._run(question, first_generation=first_generation)
 
-    def run(self, question: str) -> RetryResult:
+        key = self._cache_key(question)
+        if self._result_cache is not None:
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = None
+        final_sql = self._sql_cache.get(key) if self._sql_cache is not None else None
+        if final_sql is not None:
+            result = self._run_cached_sql(final_sql)
+            if result is None:
+                self._sql_cache.delete(key)
+        if result is None:
+            result = self._run(question, first_generation=first_generation)
+
+        if result.ok:
+            if self._result_cache is not None:
+                self._result_cache.put(key, result)
+            if self._sql_cache is not None and result.final_sql:
+                self._sql_cache.put(key, result.final_sql)
+        return result
+
+    def run_cached_many(self, questions: List[str]) -> List[Optional[RetryResult]]:
+        """
+        Answers every question whose SQL is in the SQL cache, executing all the
+        hits as one batch on a single connection (QueryExecutor.execute_many).
+        Entry i is None when question i missed, or its cached SQL no longer
+        validates / executes; callers run() those. Failed entries are evicted
+        first, so run() generates fresh SQL instead of re-executing them.
+        """
+        results: List[Optional[RetryResult]] = [None] * len(questions)
+        if self._sql_cache is None:
+            return results
+
+        hits: List[Tuple[int, Tuple[str, str, str, str], str]] = []
+        for i, q in enumerate(questions):
+            key = self._cache_key(q)
+            final_sql = self._sql_cache.get(key)
+            if final_sql is None:
+                continue
+            if validate_sql(final_sql, policy=self.policy).ok:
+                hits.append((i, key, final_sql))
+            else:
+                self._sql_cache.delete(key)
+
+        outcomes = self.executor.execute_many(sql for _, _, sql in hits)
+        for (i, key, final_sql), exec_res in zip(hits, outcomes):
+            if isinstance(exec_res, QueryExecutionError):
+                self._sql_cache.delete(key)
+            else:
+                results[i] = self._cached_result(final_sql, exec_res)
+        return results
+
+    def _run_cached_sql(self, final_sql: str) -> Optional[RetryResult]:
+        """
+        Re-executes previously rewritten SQL, skipping generation. It may come
+        from disk, so it is validated again first. None if it no longer passes.
+        """
+        if not validate_sql(final_sql, policy=self.policy).ok:
+            return None
+        try:
+            exec_res = self.executor.execute(final_sql)
+        except QueryExecutionError:
+            return None
+        return self._cached_result(final_sql, exec_res)
+
+    def _cached_result(self, final_sql: str, exec_res: Any) -> RetryResult:
+        attempt = AttemptRecord(
+            attempt=1,
+            sql_raw=final_sql,
+            sql_clean=final_sql,
+            validated_ok=True,
+            validation_reasons=(),
+            rewritten_sql=final_sql,
+            executed_ok=True,
+            error_feedback=None,
+            latency_ms=0,
+        )
+        return RetryResult(
+            ok=True,
+            final_sql=final_sql,
+            columns=exec_res.columns,
+            rows=exec_res.rows,
+            row_count=exec_res.row_count,
+            execution_time_ms=exec_res.execution_time_ms,
+            attempts=(attempt,),
+            stop_reason="success",
+        )
+
+    def _run(self, question: str, *, first_generation: Optional[GenerationResult] = None) -> RetryResult:
         attempts: List[AttemptRecord] = []
-        seen_sql: Dict[str, int] = {}
+        seen_sql: Dict[int, int] = {}  # 64-bit hash of normalized SQL -> attempt number
 
         last_sql_clean: Optional[str] = None
         last_feedback: Optional[ErrorFeedback] = None
 
         for i in range(1, self.max_attempts + 1):
-            # Inject structured feedback for self-correction
-            gen_res: GenerationResult = self.generator.generate_sql(
-                question,
-                policy=self.policy,
-                error_context=self._format_error_context(
-                    attempt=i,
-                    previous_sql=last_sql_clean,
-                    feedback=last_feedback,
-                ),
-            )
+            if i == 1 and first_generation is not None:
+                gen_res = first_generation
+            else:
+                # Inject structured feedback for self-correction
+                gen_res = self.generator.generate_sql(
+                    question,
+                    policy=self.policy,
+                    error_context=self._format_error_context(
+                        attempt=i,
+                        previous_sql=last_sql_clean,
+                        feedback=last_feedback,
+                    ),
+                )
 
             sql_clean = gen_res.sql_clean
 
-            # Oscillation / repeat detection
-            key = " ".join(sql_clean.split()).strip().upper()
+            # Oscillation / repeat detection: a deterministic generator often
+            # re-emits the same SQL modulo whitespace/case, so compare normalized
+            # hashes and stop before validate/rewrite/execute run again.
             if self.stop_on_repeat_sql:
+                key = fast_hash_int(norm_sql(sql_clean))
                 if key in seen_sql:
                     attempts.append(
                         AttemptRecord(
@@ -205,7 +349,7 @@ class RetryRunner:
                     attempts=tuple(attempts),
                     stop_reason="success",
                 )
-            except Exception as e:
+            except QueryExecutionError as e:
                 fb = _feedback_from_exception(e)
                 attempts.append(
                     AttemptRecord(
@@ -223,6 +367,36 @@ class RetryRunner:
                 last_sql_clean = final_sql
                 last_feedback = fb
                 continue
+            except Exception as e:
+                # Only QueryExecutionError is retried. Anything else the executor
+                # raises (a bug, an error it did not normalize) ends the run here.
+                attempts.append(
+                    AttemptRecord(
+                        attempt=i,
+                        sql_raw=gen_res.sql_raw,
+                        sql_clean=sql_clean,
+                        validated_ok=True,
+                        validation_reasons=(),
+                        rewritten_sql=final_sql,
+                        executed_ok=False,
+                        error_feedback=ErrorFeedback(
+                            category="unknown",
+                            message=str(e),
+                            details={"type": type(e).__name__},
+                        ),
+                        latency_ms=gen_res.latency_ms,
+                    )
+                )
+                return RetryResult(
+                    ok=False,
+                    final_sql=None,
+                    columns=None,
+                    rows=None,
+                    row_count=None,
+                    execution_time_ms=None,
+                    attempts=tuple(attempts),
+                    stop_reason="execution_deadend",
+                )
 
         # Exhausted attempts
         return RetryResult(
@@ -247,14 +421,12 @@ class RetryRunner:
             return ""
 
         # Structured feedback block for the model. Keep it short and direct.
-        payload = {
-            "attempt": attempt,
-            "previous_sql": previous_sql,
-            "error": {
-                "category": feedback.category,
-                "message": feedback.message,
-                "details": feedback.details,
-            },
-            "instruction": "Fix the SQL. Use only schema columns. Output SQL only.",
-        }
-        return json.dumps(payload, ensure_ascii=False)
+        # Only the variable fields are JSON-encoded; the result is byte-identical
+        # to json.dumps of the full payload dict.
+        return _ERROR_CONTEXT_TEMPLATE % (
+            attempt,
+            _json_str(previous_sql),
+            _json_str(feedback.category),
+            _json_str(feedback.message),
+            json.dumps(feedback.details, ensure_ascii=False) if feedback.details else "{}",
+        )
@@ -3,9 +3,11 @@ from __future__ import annotations
 
 import dataclasses
 import hashlib
-import json
+import os
 import sqlite3
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple
 
 
@@ -13,7 +15,7 @@ from typing import Any, Dict, List, Optional, Tuple
 # Data model
 # ----------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ForeignKey:
     from_column: str
     ref_table: str
@@ -21,15 +23,21 @@ class ForeignKey:
     on_update: Optional[str] = None
     on_delete: Optional[str] = None
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Column:
     name: str
     type: str
     not_null: bool
     default: Optional[str]
     is_primary_key: bool
+    # Double-quoted name for generated SQL, computed once; None if the name
+    # cannot be quoted safely (_safe_ident raises for it at use time).
+    q_name: Optional[str] = field(init=False, repr=False, compare=False)
 
-@dataclass(frozen=True)
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "q_name", None if '"' in self.name else f'"{self.name}"')
+
+@dataclass(frozen=True, slots=True)
 class Table:
     name: str
     columns: Tuple[Column, ...]
@@ -38,7 +46,7 @@ class Table:
     row_count: Optional[int] = None
     column_stats: Optional[Dict[str, Dict[str, Any]]] = None  # only if enabled
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Schema:
     dialect: str
     tables: Tuple[Table, ...]
@@ -51,13 +59,19 @@ class Schema:
 
 DEFAULT_EXCLUDE_TABLES_PREFIXES = ("sqlite_",)
 
-def _connect_readonly(db_path: str) -> sqlite3.Connection:
+def _connect_readonly(db_path: str, *, check_same_thread: bool = True) -> sqlite3.Connection:
     # SQLite read-only URI mode.
     # Works for file paths; if you use :memory: in tests, use normal connect.
     if db_path == ":memory:":
         return sqlite3.connect(db_path)
     uri = f"file:{db_path}?mode=ro"
-    return sqlite3.connect(uri, uri=True)
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread)
+    # Introspection (and the optional stats scans) re-read the same pages many times.
+    conn.execute("PRAGMA query_only = 1")
+    conn.execute("PRAGMA cache_size = -16384")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
 
 def _fetchall(conn: sqlite3.Connection, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
     cur = conn.cursor()
@@ -78,12 +92,28 @@ def _list_tables(conn: sqlite3.Connection) -> List[str]:
     names = [n for n in names if not any(n.startswith(p) for p in DEFAULT_EXCLUDE_TABLES_PREFIXES)]
     return names
 
-def _table_columns(conn: sqlite3.Connection, table: str) -> List[Column]:
-    # PRAGMA table_info: cid, name, type, notnull, dflt_value, pk
-    rows = _fetchall(conn, f"PRAGMA table_info({table})")
-    cols: List[Column] = []
-    for (_, name, ctype, notnull, dflt_value, pk) in rows:
-        cols.append(
+# pragma_table_info / pragma_foreign_key_list as table-valued functions: every
+# table's columns (or FKs) in one query instead of one PRAGMA round trip per table.
+_ALL_COLUMNS_SQL = """
+    SELECT m.name, ti.name, ti.type, ti."notnull", ti.dflt_value, ti.pk
+    FROM sqlite_master AS m
+    JOIN pragma_table_info(m.name) AS ti
+    WHERE m.type='table'
+    ORDER BY m.name, ti.cid
+"""
+
+_ALL_FOREIGN_KEYS_SQL = """
+    SELECT m.name, fk."table", fk."from", fk."to", fk.on_update, fk.on_delete
+    FROM sqlite_master AS m
+    JOIN pragma_foreign_key_list(m.name) AS fk
+    WHERE m.type='table'
+"""
+
+def _all_table_columns(conn: sqlite3.Connection) -> Dict[str, List[Column]]:
+    rows = _fetchall(conn, _ALL_COLUMNS_SQL)
+    cols_by_table: Dict[str, List[Column]] = {}
+    for (table, name, ctype, notnull, dflt_value, pk) in rows:
+        cols_by_table.setdefault(table, []).append(
             Column(
                 name=str(name),
                 type=str(ctype or "").upper(),
@@ -93,20 +123,20 @@ def _table_columns(conn: sqlite3.Connection, table: str) -> List[Column]:
             )
         )
     # preserve PRAGMA output order, but enforce stable sort anyway (name ASC)
-    cols.sort(key=lambda c: c.name)
-    return cols
+    for cols in cols_by_table.values():
+        cols.sort(key=lambda c: c.name)
+    return cols_by_table
 
 def _table_primary_key(columns: List[Column]) -> List[str]:
     pk = [c.name for c in columns if c.is_primary_key]
     pk.sort()
     return pk
 
-def _table_foreign_keys(conn: sqlite3.Connection, table: str) -> List[ForeignKey]:
-    # PRAGMA foreign_key_list: id, seq, table, from, to, on_update, on_delete, match
-    rows = _fetchall(conn, f"PRAGMA foreign_key_list({table})")
-    fks: List[ForeignKey] = []
-    for (_id, _seq, ref_table, from_col, to_col, on_update, on_delete, _match) in rows:
-        fks.append(
+def _all_foreign_keys(conn: sqlite3.Connection) -> Dict[str, List[ForeignKey]]:
+    rows = _fetchall(conn, _ALL_FOREIGN_KEYS_SQL)
+    fks_by_table: Dict[str, List[ForeignKey]] = {}
+    for (table, ref_table, from_col, to_col, on_update, on_delete) in rows:
+        fks_by_table.setdefault(table, []).append(
             ForeignKey(
                 from_column=str(from_col),
                 ref_table=str(ref_table),
@@ -115,8 +145,9 @@ def _table_foreign_keys(conn: sqlite3.Connection, table: str) -> List[ForeignKey
                 on_delete=None if on_delete is None else str(on_delete),
             )
         )
-    fks.sort(key=lambda fk: (fk.from_column, fk.ref_table, fk.ref_column))
-    return fks
+    for fks in fks_by_table.values():
+        fks.sort(key=lambda fk: (fk.from_column, fk.ref_table, fk.ref_column))
+    return fks_by_table
 
 def _safe_ident(name: str) -> str:
     # Minimal escaping for identifiers used in generated SQL.
@@ -125,68 +156,130 @@ def _safe_ident(name: str) -> str:
         raise ValueError(f'Unsafe identifier contains double quote: {name}')
     return f'"{name}"'
 
+_STATS_COLUMNS_PER_QUERY = 500
+
 def _compute_table_stats(conn: sqlite3.Connection, table: str, columns: List[Column]) -> Tuple[int, Dict[str, Dict[str, Any]]]:
     # Keep this deliberately simple and cheap-ish.
     # For each column: null_count, min, max (min/max only computed for numeric-ish and date-ish and text)
+    # One table scan computes COUNT(*) plus (nulls, min, max) for a whole group
+    # of columns, instead of three queries per column. Groups keep the result
+    # width under SQLite's default 2000-column limit.
     q_table = _safe_ident(table)
 
-    row_count = _fetchall(conn, f"SELECT COUNT(*) FROM {q_table}")[0][0]
-
+    row_count = 0
     stats: Dict[str, Dict[str, Any]] = {}
-    for c in columns:
-        q_col = _safe_ident(c.name)
-        null_count = _fetchall(conn, f"SELECT SUM(CASE WHEN {q_col} IS NULL THEN 1 ELSE 0 END) FROM {q_table}")[0][0]
-
-        col_stat: Dict[str, Any] = {"null_count": int(null_count)}
-
-        # min/max are generally safe for SQLite for numeric/text/date-like stored as TEXT.
-        # If values are mixed types, SQLite still returns something deterministic.
-        min_val = _fetchall(conn, f"SELECT MIN({q_col}) FROM {q_table}")[0][0]
-        max_val = _fetchall(conn, f"SELECT MAX({q_col}) FROM {q_table}")[0][0]
-        col_stat["min"] = min_val
-        col_stat["max"] = max_val
-
-        stats[c.name] = col_stat
+    groups = [columns[i:i + _STATS_COLUMNS_PER_QUERY] for i in range(0, len(columns), _STATS_COLUMNS_PER_QUERY)]
+    for group in groups or [[]]:
+        exprs = ["COUNT(*)"]
+        for c in group:
+            q_col = c.q_name if c.q_name is not None else _safe_ident(c.name)
+            # min/max are generally safe for SQLite for numeric/text/date-like stored as TEXT.
+            # If values are mixed types, SQLite still returns something deterministic.
+            exprs.append(f"SUM(CASE WHEN {q_col} IS NULL THEN 1 ELSE 0 END), MIN({q_col}), MAX({q_col})")
+        row = _fetchall(conn, f"SELECT {', '.join(exprs)} FROM {q_table}")[0]
+
+        row_count = row[0]
+        for j, c in enumerate(group):
+            null_count, min_val, max_val = row[1 + 3 * j: 4 + 3 * j]
+            # SUM over zero rows is NULL
+            stats[c.name] = {"null_count": int(null_count or 0), "min": min_val, "max": max_val}
 
     return int(row_count), stats
 
-def _schema_structure_dict(tables: List[Table]) -> Dict[str, Any]:
-    # Only structural parts by default.
-    # If you want stats included in schema_version, add them here behind a flag.
-    return {
-        "dialect": "sqlite",
-        "tables": [
-            {
-                "name": t.name,
-                "columns": [
-                    {
-                        "name": c.name,
-                        "type": c.type,
-                        "not_null": c.not_null,
-                        "default": c.default,
-                        "is_primary_key": c.is_primary_key,
-                    }
-                    for c in t.columns
-                ],
-                "primary_key": list(t.primary_key),
-                "foreign_keys": [
-                    {
-                        "from_column": fk.from_column,
-                        "ref_table": fk.ref_table,
-                        "ref_column": fk.ref_column,
-                        "on_update": fk.on_update,
-                        "on_delete": fk.on_delete,
-                    }
-                    for fk in t.foreign_keys
-                ],
-            }
-            for t in tables
-        ],
-    }
-
-def _stable_hash(obj: Any) -> str:
-    payload = json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
-    return hashlib.sha256(payload).hexdigest()
+def _compute_all_stats(
+    db_path: str,
+    conn: sqlite3.Connection,
+    table_names: List[str],
+    cols_by_table: Dict[str, List[Column]],
+) -> Dict[str, Tuple[int, Dict[str, Dict[str, Any]]]]:
+    """
+    _compute_table_stats for every table. The full-table scans run on a thread
+    pool with one read-only connection per worker (sqlite3 releases the GIL
+    while a query runs). :memory: databases cannot be reopened, so they, and
+    single-table schemas, use conn sequentially.
+    """
+    if db_path == ":memory:" or len(table_names) < 2:
+        return {t: _compute_table_stats(conn, t, cols_by_table.get(t, [])) for t in table_names}
+
+    local = threading.local()
+    conns: List[sqlite3.Connection] = []
+    conns_lock = threading.Lock()
+
+    def stats_for(tname: str) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        wconn = getattr(local, "conn", None)
+        if wconn is None:
+            # closed by the calling thread once the pool is done
+            wconn = _connect_readonly(db_path, check_same_thread=False)
+            local.conn = wconn
+            with conns_lock:
+                conns.append(wconn)
+        return _compute_table_stats(wconn, tname, cols_by_table.get(tname, []))
+
+    workers = min(len(table_names), os.cpu_count() or 1)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(table_names, pool.map(stats_for, table_names)))
+    finally:
+        for wconn in conns:
+            wconn.close()
+
+# Canonical byte stream for _stable_hash_tables: unit / record separators
+# cannot appear in SQLite identifiers or declared types, None gets its own token.
+_FS = "\x1f"
+_RS = "\x1e"
+_NONE = "\x00"
+
+def _field(v: Any) -> str:
+    if v is None:
+        return _NONE
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    return str(v)
+
+def _stable_hash_tables(tables: List[Table], *, strong: bool = False) -> str:
+    """
+    Structural fingerprint for change detection: a 64-bit BLAKE2b fed directly
+    from the Table / Column / ForeignKey fields, one update per table, with no
+    intermediate dict or JSON document. strong=True hashes the same canonical
+    bytes with 128-bit BLAKE2b (32 hex chars) for audit snapshots.
+    """
+    if strong:
+        return hashlib.blake2b(_canonical_bytes(tables), digest_size=16).hexdigest()
+
+    h = hashlib.blake2b(b"sqlite", digest_size=8)
+    for t in tables:
+        h.update(_table_bytes_of(t))
+    return h.hexdigest()
+
+def _canonical_bytes(tables: List[Table]) -> bytes:
+    # Tables are already in sorted order; fixed separator bytes instead of sorted JSON.
+    buf = bytearray(b"sqlite")
+    for t in tables:
+        buf += _table_bytes_of(t)
+    return bytes(buf)
+
+def _table_bytes_of(t: Table) -> bytes:
+    return _table_bytes(
+        t.name,
+        [(c.name, c.type, c.not_null, c.default, c.is_primary_key) for c in t.columns],
+        t.primary_key,
+        [(fk.from_column, fk.ref_table, fk.ref_column, fk.on_update, fk.on_delete) for fk in t.foreign_keys],
+    )
+
+# Plain-tuple row shapes shared by the dataclass path and load_schema_blob:
+#   column: (name, type, not_null, default, is_primary_key)
+#   fk:     (from_column, ref_table, ref_column, on_update, on_delete)
+ColumnRow = Tuple[str, str, bool, Optional[str], bool]
+ForeignKeyRow = Tuple[str, str, str, Optional[str], Optional[str]]
+
+def _table_bytes(name: str, cols: List[ColumnRow], pk: Tuple[str, ...], fks: List[ForeignKeyRow]) -> bytes:
+    parts: List[str] = [_RS, "T", name]
+    for (cname, ctype, not_null, default, is_pk) in cols:
+        parts += [_RS, "C", cname, ctype, _field(not_null), _field(default), _field(is_pk)]
+    parts += [_RS, "P", *pk]
+    for (from_col, ref_table, ref_col, on_update, on_delete) in fks:
+        parts += [_RS, "F", from_col, ref_table, ref_col, _field(on_update), _field(on_delete)]
+    return _FS.join(parts).encode("utf-8")
 
 def load_schema(
     db_path: str,
@@ -194,10 +287,12 @@ def load_schema(
     include_stats: bool = False,
     include_row_counts: bool = False,
     include_column_stats: bool = False,
+    strong_hash: bool = False,
 ) -> Schema:
     """
     include_stats is a convenience: if True, includes row counts + column stats.
     Otherwise you can toggle include_row_counts / include_column_stats.
+    strong_hash: 128-bit schema_version (audit snapshots) instead of the fast 64-bit one.
     """
     if include_stats:
         include_row_counts = True
@@ -205,19 +300,28 @@ def load_schema(
 
     conn = _connect_readonly(db_path)
     try:
+        # One read transaction for the whole load: the shared lock is taken once
+        # instead of per PRAGMA / stats query, and every query sees one snapshot.
+        conn.execute("BEGIN")
         table_names = _list_tables(conn)
+        cols_by_table = _all_table_columns(conn)
+        fks_by_table = _all_foreign_keys(conn)
         tables: List[Table] = []
 
+        stats_by_table: Dict[str, Tuple[int, Dict[str, Dict[str, Any]]]] = {}
+        if include_row_counts or include_column_stats:
+            stats_by_table = _compute_all_stats(db_path, conn, table_names, cols_by_table)
+
         for tname in table_names:
-            cols = _table_columns(conn, tname)
+            cols = cols_by_table.get(tname, [])
             pk = _table_primary_key(cols)
-            fks = _table_foreign_keys(conn, tname)
+            fks = fks_by_table.get(tname, [])
 
             row_count: Optional[int] = None
             col_stats: Optional[Dict[str, Dict[str, Any]]] = None
 
             if include_row_counts or include_column_stats:
-                rc, cs = _compute_table_stats(conn, tname, cols)
+                rc, cs = stats_by_table[tname]
                 if include_row_counts:
                     row_count = rc
                 if include_column_stats:
@@ -237,9 +341,11 @@ def load_schema(
         # stable sort
         tables.sort(key=lambda t: t.name)
 
-        schema_version = _stable_hash(_schema_structure_dict(tables))
+        schema_version = _stable_hash_tables(tables, strong=strong_hash)
         return Schema(dialect="sqlite", tables=tuple(tables), schema_version=schema_version)
     finally:
+        if conn.in_transaction:
+            conn.execute("COMMIT")
         conn.close()
 
 
@@ -247,72 +353,136 @@ def load_schema(
 # Prompt serialization
 # ----------------------------
 
+def _append_table_lines(
+    lines: List[str],
+    name: str,
+    primary_key: Tuple[str, ...],
+    fk_parts: List[str],
+    cols: List[Tuple[str, str, bool, bool]],  # (name, type, not_null, is_primary_key)
+) -> None:
+    app = lines.append  # bound once: this runs per column of every table
+    app(f"- {name}")
+    if primary_key:
+        app(f"  PK: {', '.join(primary_key)}")
+    if fk_parts:
+        app(f"  FK: {', '.join(fk_parts)}")
+
+    app("  COLUMNS:")
+    for (cname, ctype, not_null, is_pk) in cols:
+        if not_null:
+            flag_str = " [NOT_NULL|PK]" if is_pk else " [NOT_NULL]"
+        else:
+            flag_str = " [PK]" if is_pk else ""
+        app(f"    - {cname}: {ctype or 'UNKNOWN'}{flag_str}")
+
+def load_schema_blob(db_path: str, *, max_chars: int = 6000) -> Tuple[str, str]:
+    """
+    (serialize_schema_for_prompt(load_schema(db_path)), schema_version), built
+    straight from the PRAGMA rows: no Column / Table / Schema objects on the
+    prompt path. Structure only (no stats), fast 64-bit schema_version.
+    """
+    conn = _connect_readonly(db_path)
+    try:
+        conn.execute("BEGIN")
+        table_names = sorted(_list_tables(conn))
+        col_rows = _fetchall(conn, _ALL_COLUMNS_SQL)
+        fk_rows = _fetchall(conn, _ALL_FOREIGN_KEYS_SQL)
+    finally:
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+        conn.close()
+
+    cols_by_table: Dict[str, List[ColumnRow]] = {}
+    for (table, name, ctype, notnull, dflt_value, pk) in col_rows:
+        cols_by_table.setdefault(table, []).append(
+            (str(name), str(ctype or "").upper(), bool(notnull), None if dflt_value is None else str(dflt_value), bool(pk))
+        )
+    fks_by_table: Dict[str, List[ForeignKeyRow]] = {}
+    for (table, ref_table, from_col, to_col, on_update, on_delete) in fk_rows:
+        fks_by_table.setdefault(table, []).append(
+            (
+                str(from_col),
+                str(ref_table),
+                str(to_col),
+                None if on_update is None else str(on_update),
+                None if on_delete is None else str(on_delete),
+            )
+        )
+
+    # Same canonical ordering and hash stream as load_schema.
+    h = hashlib.blake2b(b"sqlite", digest_size=8)
+    body: List[str] = []
+    for tname in table_names:
+        cols = sorted(cols_by_table.get(tname, []), key=lambda c: c[0])
+        fks = sorted(fks_by_table.get(tname, []), key=lambda fk: fk[:3])
+        pk = tuple(sorted(c[0] for c in cols if c[4]))
+        h.update(_table_bytes(tname, cols, pk, fks))
+        _append_table_lines(
+            body,
+            tname,
+            pk,
+            [f"{fk[0]}->{fk[1]}.{fk[2]}" for fk in fks],
+            [(c[0], c[1], c[2], c[4]) for c in cols],
+        )
+    schema_version = h.hexdigest()
+
+    text = "\n".join(["DIALECT: sqlite", f"SCHEMA_VERSION: {schema_version}", "TABLES:", *body])
+    # Without stats there is nothing to prune: over budget means a hard cut.
+    return (text if len(text) <= max_chars else text[:max_chars]), schema_version
+
 def serialize_schema_for_prompt(schema: Schema, *, max_chars: int = 6000) -> str:
     """
     Minimal, stable, compact text.
     Deterministic ordering.
     Avoids noisy details.
     """
+    # Structure and COL_STATS lines are kept apart (per table), so the over-budget
+    # case drops stats by just not joining them, instead of re-scanning the text.
     lines: List[str] = []
     lines.append(f"DIALECT: {schema.dialect}")
     lines.append(f"SCHEMA_VERSION: {schema.schema_version}")
     lines.append("TABLES:")
+    stats_after: Dict[int, List[str]] = {}  # index in lines -> COL_STATS block to insert there
 
     for t in schema.tables:
-        lines.append(f"- {t.name}")
-        if t.primary_key:
-            lines.append(f"  PK: {', '.join(t.primary_key)}")
-        if t.foreign_keys:
-            fk_parts = []
-            for fk in t.foreign_keys:
-                fk_parts.append(f"{fk.from_column}->{fk.ref_table}.{fk.ref_column}")
-            lines.append(f"  FK: {', '.join(fk_parts)}")
-
-        lines.append("  COLUMNS:")
-        for c in t.columns:
-            flags = []
-            if c.not_null:
-                flags.append("NOT_NULL")
-            if c.is_primary_key:
-                flags.append("PK")
-            flag_str = f" [{'|'.join(flags)}]" if flags else ""
-            dtype = c.type or "UNKNOWN"
-            lines.append(f"    - {c.name}: {dtype}{flag_str}")
+        _append_table_lines(
+            lines,
+            t.name,
+            t.primary_key,
+            [f"{fk.from_column}->{fk.ref_table}.{fk.ref_column}" for fk in t.foreign_keys],
+            [(c.name, c.type, c.not_null, c.is_primary_key) for c in t.columns],
+        )
 
         # Stats are optional and can bloat prompts. Include only if present.
         if t.row_count is not None:
             lines.append(f"  ROWS: {t.row_count}")
         if t.column_stats is not None:
-            lines.append("  COL_STATS:")
+            block = ["  COL_STATS:"]
+            block_app = block.append
             for col_name in sorted(t.column_stats.keys()):
                 s = t.column_stats[col_name]
                 # keep compact
-                lines.append(f"    - {col_name}: nulls={s.get('null_count')}, min={s.get('min')}, max={s.get('max')}")
+                block_app(f"    - {col_name}: nulls={s.get('null_count')}, min={s.get('min')}, max={s.get('max')}")
+            stats_after[len(lines)] = block
+
+    # Joined length is sum(len) + one newline per extra line; decide before joining.
+    struct_len = sum(map(len, lines)) + len(lines) - 1
+    stats_len = sum(sum(map(len, b)) + len(b) for b in stats_after.values())
+
+    if stats_after and struct_len + stats_len <= max_chars:
+        full: List[str] = []
+        prev = 0
+        for idx, block in stats_after.items():
+            full.extend(lines[prev:idx])
+            full.extend(block)
+            prev = idx
+        full.extend(lines[prev:])
+        return "\n".join(full)
 
+    # Truncate defensively. Prefer keeping structure over stats.
     text = "\n".join(lines)
-
     if len(text) <= max_chars:
         return text
 
-    # Truncate defensively. Prefer keeping structure over stats.
-    # Remove COL_STATS blocks first.
-    pruned_lines: List[str] = []
-    skip = False
-    for line in lines:
-        if line.strip() == "COL_STATS:":
-            skip = True
-            continue
-        if skip:
-            if line.startswith("- ") or line.startswith("  ") is False:
-                skip = False
-            else:
-                continue
-        if not skip:
-            pruned_lines.append(line)
-
-    text2 = "\n".join(pruned_lines)
-    if len(text2) <= max_chars:
-        return text2
-
     # Last resort: hard cut
-    return text2[:max_chars]
+    return text[:max_chars]
@@ -1,29 +1,64 @@
 # src/schema_service.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional
 
-from src.schema_loader import load_schema, serialize_schema_for_prompt, Schema
+from src.schema_loader import load_schema, load_schema_blob, Schema
+
+
+def _int_or_real_affinity(decl_type: str) -> bool:
+    # SQLite's affinity rules, in order. NUMERIC affinity (e.g. DATE, DATETIME)
+    # is deliberately not treated as numeric: those columns usually hold dates.
+    t = decl_type.upper()
+    if "INT" in t:
+        return True
+    if "CHAR" in t or "CLOB" in t or "TEXT" in t or "BLOB" in t or not t:
+        return False
+    return "REAL" in t or "FLOA" in t or "DOUB" in t
 
 @dataclass
 class SchemaService:
     db_path: str
     _schema: Optional[Schema] = None
     _schema_blob: Optional[str] = None
+    _schema_version: Optional[str] = None
+    _type_hints: Optional[Dict[str, str]] = None
 
     def refresh(self) -> None:
-        self._schema = load_schema(self.db_path, include_stats=False)
-        self._schema_blob = serialize_schema_for_prompt(self._schema)
+        # The prompt path (schema_blob / schema_version) never needs the Schema
+        # objects, so they are only built if schema() is actually called.
+        self._schema = None
+        self._type_hints = None
+        self._schema_blob, self._schema_version = load_schema_blob(self.db_path)
 
     def schema(self) -> Schema:
         if self._schema is None:
-            self.refresh()
+            self._schema = load_schema(self.db_path, include_stats=False)
         return self._schema
 
+    def column_type_hints(self) -> Dict[str, str]:
+        """
+        Column name -> "numeric" for columns declared with integer/real affinity,
+        for summarize_table(known_types=...). Names declared differently in two
+        tables are left out, since a result column cannot be traced to its table.
+        """
+        if self._type_hints is None:
+            hints: Dict[str, str] = {}
+            conflicts = set()
+            for t in self.schema().tables:
+                for c in t.columns:
+                    kind = "numeric" if _int_or_real_affinity(c.type) else ""
+                    if hints.setdefault(c.name, kind) != kind:
+                        conflicts.add(c.name)
+            self._type_hints = {k: v for k, v in hints.items() if v and k not in conflicts}
+        return self._type_hints
+
     def schema_blob(self) -> str:
         if self._schema_blob is None:
             self.refresh()
         return self._schema_blob
 
     def schema_version(self) -> str:
-        return self.schema().schema_version
+        if self._schema_version is None:
+            self.refresh()
+        return self._schema_version
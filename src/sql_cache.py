@@ -0,0 +1,54 @@
+# src/sql_cache.py
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+def _key_str(key: Any) -> str:
+    # Tuple keys (question, db_path, schema_version, model_name) -> fixed-width text key.
+    if not isinstance(key, str):
+        key = "\x1f".join(str(k) for k in key)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SQLCache:
+    """
+    Persistent question -> final SQL store, shared across runs.
+    Same get/put/delete interface as LRUCache, so RetryRunner can use either.
+    The schema version is part of the key, so a schema change never serves stale SQL.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, sql TEXT NOT NULL, ts INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: Any) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT sql FROM cache WHERE key = ?", (_key_str(key),)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, key: Any, sql: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, sql, ts) VALUES (?, ?, ?)",
+                (_key_str(key), sql, int(time.time())),
+            )
+            self._conn.commit()
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (_key_str(key),))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
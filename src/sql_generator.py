@@ -1,19 +1,23 @@
 # src/sql_generator.py
 from __future__ import annotations
 
+import copy
 import re
+import threading
 import time
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, DynamicCache
 
 from src.schema_service import SchemaService
 from src.sql_policy import SQLPolicy
 
 
 CODE_FENCE_RE = re.compile(r"```(?:sql)?\s*([\s\S]*?)\s*```", re.IGNORECASE)
+# First line where the model starts narrating (after optional indentation).
+NARRATION_RE = re.compile(r"^[^\S\n]*(?:explanation|reason|note)", re.IGNORECASE | re.MULTILINE)
 
 
 @dataclass(frozen=True)
@@ -26,6 +30,17 @@ class GenerationConfig:
     repetition_penalty: float = 1.05
     device: Optional[str] = None  # "cuda", "cpu", etc.
     dtype: Optional[str] = None   # "float16", "bfloat16", "float32"
+    quantization: Optional[str] = None  # None, "int8", "nf4" (nf4 needs CUDA + bitsandbytes)
+    # Speculative decoding (single-question generate_sql only; ignored for batches).
+    # A small draft model sharing the tokenizer, e.g. "Qwen/Qwen2.5-Coder-0.5B-Instruct".
+    assistant_model_name: Optional[str] = None
+    # Draft-model-free alternative: propose n-gram continuations copied from the prompt
+    # (schema column names, SQL keywords). Used only when no assistant model is set.
+    prompt_lookup_num_tokens: Optional[int] = None
+    # Opt-in torch.compile of the decoder forward, e.g. "default" or "max-autotune-no-cudagraphs".
+    # Compiled with dynamic shapes, since prompt/suffix lengths vary and the prefix
+    # KV cache is a DynamicCache. Costs a one-off compile on the first calls.
+    compile_mode: Optional[str] = None
 
 
 @dataclass(frozen=True)
@@ -38,24 +53,22 @@ class GenerationResult:
     meta: Dict[str, Any]
 
 
-def build_sql_prompt(
+def build_sql_prompt_prefix(
     *,
     schema_blob: str,
-    question: str,
     policy: Optional[SQLPolicy] = None,
-    error_context: Optional[str] = None,
 ) -> str:
     """
-    Phase 2 prompt: schema + hard formatting rules + SQL anchor.
-    Keep it minimal and stable.
+    Static part of the Phase 2 prompt: hard rules + schema.
+    Only depends on the schema and policy, so its KV cache can be reused
+    across questions.
     """
     policy = policy or SQLPolicy()
 
     # Mandatory LIMIT rule:
     # - If the query is NOT an aggregation query, enforce LIMIT.
     # This is a generation rule. Rewriter still enforces hard limits later.
-    rules = f"""
-You generate ONE SQLite query for analytics.
+    return f"""You generate ONE SQLite query for analytics.
 
 Hard rules:
 - Output SQL only. No explanations. No markdown.
@@ -72,20 +85,46 @@ Schema:
 {schema_blob}
 
 User question:
-{question}
-""".strip()
+"""
+
+
+def build_sql_prompt_suffix(
+    *,
+    question: str,
+    error_context: Optional[str] = None,
+) -> str:
+    """
+    Per-request part of the Phase 2 prompt: question + optional retry feedback + SQL anchor.
+    """
+    suffix = question.rstrip()
 
     if error_context:
-        rules += f"""
+        suffix += f"""
 
             Previous attempt feedback (JSON):
             {error_context}
             """.strip()
 
-    rules += "\n\nSQL:\n"
+    suffix += "\n\nSQL:\n"
 
+    return suffix
 
-    return rules
+
+def build_sql_prompt(
+    *,
+    schema_blob: str,
+    question: str,
+    policy: Optional[SQLPolicy] = None,
+    error_context: Optional[str] = None,
+) -> str:
+    """
+    Phase 2 prompt: schema + hard formatting rules + SQL anchor.
+    Keep it minimal and stable.
+    """
+    return build_sql_prompt_prefix(schema_blob=schema_blob, policy=policy) + build_sql_prompt_suffix(
+        question=question,
+        error_context=error_context,
+    )
 
 
 def _strip_code_fences(text: str) -> str:
@@ -104,20 +143,17 @@ def _postprocess_to_sql(model_text: str) -> str:
     """
     s = _strip_code_fences(model_text)
 
-    # If the model wrote extra junk after SQL, cut at the first blank line
-    # after something that looks like SQL. Conservative.
-    parts = s.splitlines()
-    cleaned_lines = []
-    for line in parts:
-        # Stop if the model starts narrating
-        if line.strip().lower().startswith(("explanation", "reason", "note")):
-            break
-        cleaned_lines.append(line)
-    s = "\n".join(cleaned_lines).strip()
+    # If the model wrote extra junk after SQL, cut where it starts narrating:
+    # one regex scan to the boundary, then a single slice.
+    m = NARRATION_RE.search(s)
+    if m:
+        s = s[:m.start()]
+    s = s.strip()
 
     # Also cut at first semicolon if present (validator will reject anyway)
-    if ";" in s:
-        s = s.split(";", 1)[0].strip()
+    sc = s.find(";")
+    if sc >= 0:
+        s = s[:sc].strip()
 
     return s
 
@@ -145,6 +181,40 @@ def _select_dtype(device: str, dtype_str: Optional[str]):
     raise ValueError(f"Unsupported dtype: {dtype_str}")
 
 
+def _expand_cache(past_key_values: Any, batch_size: int) -> DynamicCache:
+    # Broadcast a batch-1 prefix cache to batch_size rows (copies, so the shared prefix stays intact).
+    legacy = past_key_values.to_legacy_cache() if hasattr(past_key_values, "to_legacy_cache") else past_key_values
+    return DynamicCache.from_legacy_cache(tuple(
+        (k.expand(batch_size, -1, -1, -1).contiguous(), v.expand(batch_size, -1, -1, -1).contiguous())
+        for k, v in legacy
+    ))
+
+
+def _quantization_config(quantization: Optional[str], device: str) -> Optional[BitsAndBytesConfig]:
+    """
+    bitsandbytes config for CUDA. On CPU, int8 is applied after loading via
+    dynamic quantization of the Linear layers instead (see SQLGenerator.__init__).
+    """
+    if quantization is None:
+        return None
+
+    q = quantization.lower()
+    if q not in ("int8", "nf4"):
+        raise ValueError(f"Unsupported quantization: {quantization}")
+    if device != "cuda":
+        if q == "nf4":
+            raise ValueError("nf4 quantization requires CUDA (bitsandbytes).")
+        return None
+
+    if q == "int8":
+        return BitsAndBytesConfig(load_in_8bit=True)
+    return BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_compute_dtype=torch.bfloat16,
+    )
+
+
 class SQLGenerator:
     """
     Deterministic NL -> SQL generator. Does NOT validate or execute.
@@ -159,78 +229,215 @@ class SQLGenerator:
         self.dtype = _select_dtype(self.device, self.cfg.dtype)
 
         self.tokenizer = AutoTokenizer.from_pretrained(self.cfg.model_name, use_fast=True)
+        # Batched decoder-only generation needs left padding.
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        quant_cfg = _quantization_config(self.cfg.quantization, self.device)
         self.model = AutoModelForCausalLM.from_pretrained(
             self.cfg.model_name,
             torch_dtype=self.dtype,
             device_map="auto" if self.device == "cuda" else None,
+            quantization_config=quant_cfg,
         )
 
         if self.device != "cuda":
             self.model.to(self.device)
 
+        if self.cfg.quantization and quant_cfg is None:
+            # CPU int8: quantize Linear weights, activations stay float.
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
         self.model.eval()
+        self.model.generation_config.use_cache = True
+
+        if self.cfg.compile_mode:
+            # generate() calls forward once per decoding step: that is the hot path.
+            self.model.forward = torch.compile(self.model.forward, mode=self.cfg.compile_mode, dynamic=True)
+
+        self.assistant_model = None
+        if self.cfg.assistant_model_name:
+            self.assistant_model = AutoModelForCausalLM.from_pretrained(
+                self.cfg.assistant_model_name,
+                torch_dtype=self.dtype,
+                device_map="auto" if self.device == "cuda" else None,
+            )
+            if self.device != "cuda":
+                self.assistant_model.to(self.device)
+            self.assistant_model.eval()
+
+        # Rendered text, token ids and KV cache of the static prompt prefix
+        # (rules + schema), keyed by policy. Dropped whenever the schema version changes.
+        self._prefix_past_key_values: Dict[SQLPolicy, Tuple[str, torch.Tensor, Any]] = {}
+        self._prefix_schema_version: Optional[str] = None
+
+        # One model, many caller threads (eval workers): model calls and the
+        # prefix cache are serialized; callers overlap SQL execution instead.
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return self.cfg.model_name
+
+    def _prefix_cache(self, policy: Optional[SQLPolicy]) -> Tuple[str, torch.Tensor, Any]:
+        """
+        Prompt text, token ids and past_key_values for the static prompt prefix.
+        Rendered, tokenized and prefilled once per (schema version, policy) and
+        reused by every generate_sql call; a hit costs one dict lookup.
+        """
+        schema_version = self.schema_service.schema_version()
+        if schema_version != self._prefix_schema_version:
+            self._prefix_past_key_values = {}
+            self._prefix_schema_version = schema_version
+
+        policy = policy or SQLPolicy()
+        cached = self._prefix_past_key_values.get(policy)
+        if cached is None:
+            prefix = build_sql_prompt_prefix(schema_blob=self.schema_service.schema_blob(), policy=policy)
+            prefix_ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"].to(self.device)
+            outputs = self.model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True)
+            cached = (prefix, prefix_ids, outputs.past_key_values)
+            self._prefix_past_key_values[policy] = cached
+        return cached
 
     @torch.inference_mode()
     def generate_sql(self, question: str, policy: Optional[SQLPolicy] = None, error_context: Optional[str] = None,
 ) -> GenerationResult:
-        schema_blob = self.schema_service.schema_blob()
-        prompt = build_sql_prompt(
-            schema_blob=schema_blob,
-            question=question,
-            policy=policy,
-            error_context=error_context,
-        )
+        suffix = build_sql_prompt_suffix(question=question, error_context=error_context)
+        suffix_ids = self.tokenizer(suffix, return_tensors="pt", add_special_tokens=False)["input_ids"]
 
-        inputs = self.tokenizer(prompt, return_tensors="pt")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-        t0 = time.time()
-        gen_kwargs = dict(
-            max_new_tokens=self.cfg.max_new_tokens,
-            do_sample=False,  # deterministic
-            pad_token_id=self.tokenizer.eos_token_id,
-            eos_token_id=self.tokenizer.eos_token_id,
-            repetition_penalty=self.cfg.repetition_penalty,
-        )
-        
-        if self.cfg.do_sample:
-          gen_kwargs.update(
-              do_sample=True,
-              temperature=self.cfg.temperature,
-              top_p=self.cfg.top_p,
-          )
-
-        out = self.model.generate(
-            **inputs,
-            **gen_kwargs
-        )
+        with self._lock:
+            t0 = time.perf_counter()
 
+            # Only the question-specific suffix is tokenized and prefilled; the
+            # prefix text, ids and KV cache are reused.
+            prefix, prefix_ids, prefix_pkv = self._prefix_cache(policy)
+            input_ids = torch.cat([prefix_ids, suffix_ids.to(self.device)], dim=1)
+            inputs = {
+                "input_ids": input_ids,
+                "attention_mask": torch.ones_like(input_ids),
+                # generate() extends the cache in place, so hand it a private copy
+                "past_key_values": copy.deepcopy(prefix_pkv),
+            }
 
-        latency_ms = int((time.time() - t0) * 1000)
+            out = self.model.generate(
+                **inputs,
+                **self._generation_kwargs()
+            )
 
-        decoded = self.tokenizer.decode(out[0], skip_special_tokens=True)
+            latency_ms = int((time.perf_counter() - t0) * 1000)
 
-        # Extract the "new" text beyond the prompt if present
-        if decoded.startswith(prompt):
-            completion = decoded[len(prompt):].strip()
-        else:
-            completion = decoded.strip()
+        # Decode only the generated ids; the prompt is never decoded or scanned.
+        completion = self.tokenizer.decode(out[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
 
         sql_clean = _postprocess_to_sql(completion)
 
         return GenerationResult(
             sql_raw=completion,
             sql_clean=sql_clean,
-            prompt=prompt,
+            prompt=prefix + suffix,
             model_name=self.cfg.model_name,
             latency_ms=latency_ms,
-            meta={
-                "device": self.device,
-                "dtype": str(self.dtype),
-                "max_new_tokens": self.cfg.max_new_tokens,
-                "do_sample": self.cfg.do_sample,
-                "temperature": self.cfg.temperature,
-                "top_p": self.cfg.top_p,
-                "repetition_penalty": self.cfg.repetition_penalty,
-            },
+            meta=self._meta(),
         )
+
+    @torch.inference_mode()
+    def generate_sql_batch(self, questions: List[str], policy: Optional[SQLPolicy] = None) -> List[GenerationResult]:
+        """
+        First-attempt generation for many questions in one model.generate call.
+        All rows share the cached prompt prefix; only the question suffixes are prefilled.
+        Latency is reported per question as the batch wall time divided by batch size.
+        """
+        if not questions:
+            return []
+
+        suffixes = [build_sql_prompt_suffix(question=q) for q in questions]
+        batch_size = len(questions)
+
+        # Layout per row is [prefix][pad ...][suffix]; pads are masked out, so the
+        # real suffix tokens still get positions that continue the cached prefix.
+        enc = self.tokenizer(suffixes, return_tensors="pt", padding=True, add_special_tokens=False)
+
+        with self._lock:
+            t0 = time.perf_counter()
+
+            prefix, prefix_ids, prefix_pkv = self._prefix_cache(policy)
+            input_ids = torch.cat([prefix_ids.expand(batch_size, -1), enc["input_ids"].to(self.device)], dim=1)
+            attention_mask = torch.cat(
+                [
+                    torch.ones((batch_size, prefix_ids.shape[1]), dtype=enc["attention_mask"].dtype, device=self.device),
+                    enc["attention_mask"].to(self.device),
+                ],
+                dim=1,
+            )
+
+            out = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=_expand_cache(prefix_pkv, batch_size),
+                **self._generation_kwargs(batched=True)
+            )
+
+            batch_latency_ms = int((time.perf_counter() - t0) * 1000)
+
+        completions = self.tokenizer.batch_decode(out[:, input_ids.shape[1]:], skip_special_tokens=True)
+
+        results: List[GenerationResult] = []
+        for suffix, completion in zip(suffixes, completions):
+            completion = completion.strip()
+            results.append(
+                GenerationResult(
+                    sql_raw=completion,
+                    sql_clean=_postprocess_to_sql(completion),
+                    prompt=prefix + suffix,
+                    model_name=self.cfg.model_name,
+                    latency_ms=batch_latency_ms // batch_size,
+                    meta={
+                        **self._meta(),
+                        "batch_size": batch_size,
+                        "batch_latency_ms": batch_latency_ms,
+                    },
+                )
+            )
+        return results
+
+    def _generation_kwargs(self, *, batched: bool = False) -> Dict[str, Any]:
+        gen_kwargs: Dict[str, Any] = dict(
+            max_new_tokens=self.cfg.max_new_tokens,
+            do_sample=False,  # deterministic
+            pad_token_id=self.tokenizer.eos_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+            repetition_penalty=self.cfg.repetition_penalty,
+        )
+
+        if self.cfg.do_sample:
+            gen_kwargs.update(
+                do_sample=True,
+                temperature=self.cfg.temperature,
+                top_p=self.cfg.top_p,
+            )
+
+        # Assisted / prompt-lookup decoding only supports batch size 1.
+        if not batched:
+            if self.assistant_model is not None:
+                gen_kwargs["assistant_model"] = self.assistant_model
+            elif self.cfg.prompt_lookup_num_tokens:
+                gen_kwargs["prompt_lookup_num_tokens"] = self.cfg.prompt_lookup_num_tokens
+        return gen_kwargs
+
+    def _meta(self) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "dtype": str(self.dtype),
+            "quantization": self.cfg.quantization,
+            "max_new_tokens": self.cfg.max_new_tokens,
+            "do_sample": self.cfg.do_sample,
+            "temperature": self.cfg.temperature,
+            "top_p": self.cfg.top_p,
+            "repetition_penalty": self.cfg.repetition_penalty,
+            "assistant_model_name": self.cfg.assistant_model_name,
+            "prompt_lookup_num_tokens": self.cfg.prompt_lookup_num_tokens,
+            "compile_mode": self.cfg.compile_mode,
+        }
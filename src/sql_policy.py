@@ -38,14 +38,15 @@ FORBIDDEN_KEYWORDS: Tuple[str, ...] = (
     "ATTACH", "DETACH", "PRAGMA",
 )
 
-COMMENT_PATTERNS: Tuple[re.Pattern, ...] = (
-    re.compile(r"--"),          # line comment
-    re.compile(r"/\*"),         # block comment start
-    re.compile(r"\*/"),         # block comment end
-)
+# All forbidden keywords in one pass, as whole words only (so created_at is not CREATE).
+FORBIDDEN_RE = re.compile(r"\b(" + "|".join(map(re.escape, FORBIDDEN_KEYWORDS)) + r")\b", re.IGNORECASE)
+
+# line comment, block comment start, block comment end -- one scan for all three
+COMMENT_RE = re.compile(r"--|/\*|\*/")
 
 SEMICOLON_RE = re.compile(r";")
 
 STARTS_WITH_SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
 WITH_RE = re.compile(r"^\s*WITH\b", re.IGNORECASE)
+SELECT_OR_WITH_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
 SELECT_STAR_RE = re.compile(r"^\s*SELECT\s+\*\b", re.IGNORECASE)
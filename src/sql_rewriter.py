@@ -10,6 +10,8 @@ from src.sql_policy import SQLPolicy
 
 LIMIT_RE = re.compile(r"\bLIMIT\b", re.IGNORECASE)
 LIMIT_VALUE_RE = re.compile(r"\bLIMIT\s+(\d+)\b", re.IGNORECASE)
+# Presence and numeric value in one scan: group 1 is None for e.g. "LIMIT :n".
+LIMIT_COMBINED_RE = re.compile(r"\bLIMIT\b(?:\s+(\d+)\b)?", re.IGNORECASE)
 
 
 @dataclass(frozen=True)
@@ -24,18 +26,20 @@ def rewrite_sql(validated_sql: str, policy: Optional[SQLPolicy] = None) -> Rewri
     applied = []
 
     # If LIMIT missing, add it.
-    if not LIMIT_RE.search(sql):
+    m = LIMIT_COMBINED_RE.search(sql)
+    if m is None:
         sql = sql.rstrip()
         sql = f"{sql} LIMIT {policy.default_limit}"
         applied.append("added_limit")
         return RewriteResult(sql=sql, applied=tuple(applied))
 
-    # If LIMIT present, cap it.
-    m = LIMIT_VALUE_RE.search(sql)
+    # If LIMIT present, cap it (the first numeric one, which is usually the first LIMIT).
+    if m.group(1) is None:
+        m = LIMIT_VALUE_RE.search(sql, m.end())
     if m:
         lim = int(m.group(1))
         if lim > policy.max_limit:
-            sql = LIMIT_VALUE_RE.sub(f"LIMIT {policy.max_limit}", sql, count=1)
+            sql = f"{sql[:m.start()]}LIMIT {policy.max_limit}{sql[m.end():]}"
             applied.append("capped_limit")
 
     return RewriteResult(sql=sql, applied=tuple(applied))
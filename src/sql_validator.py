@@ -8,10 +8,11 @@ from typing import List, Optional, Tuple
 from src.sql_policy import (
     SQLPolicy,
     FORBIDDEN_KEYWORDS,
-    COMMENT_PATTERNS,
+    FORBIDDEN_RE,
+    COMMENT_RE,
     SEMICOLON_RE,
     STARTS_WITH_SELECT_RE,
-    WITH_RE,
+    SELECT_OR_WITH_RE,
     SELECT_STAR_RE,
 )
 
@@ -22,11 +23,6 @@ class ValidationDecision:
     reasons: Tuple[str, ...]
 
 
-def _upper_sql(sql: str) -> str:
-    # Normalize only for keyword scanning. Do not rewrite content.
-    return sql.upper()
-
-
 def validate_sql(raw_sql: str, policy: Optional[SQLPolicy] = None) -> ValidationDecision:
     policy = policy or SQLPolicy()
     reasons: List[str] = []
@@ -41,11 +37,8 @@ def validate_sql(raw_sql: str, policy: Optional[SQLPolicy] = None) -> Validation
         reasons.append("contains_semicolon")
 
     # 2) Comments (hide payload / obfuscate)
-    if policy.disallow_comments:
-        for pat in COMMENT_PATTERNS:
-            if pat.search(sql):
-                reasons.append("contains_comment_syntax")
-                break
+    if policy.disallow_comments and COMMENT_RE.search(sql):
+        reasons.append("contains_comment_syntax")
 
     # 3) Must start with SELECT (or optionally WITH if allowed later)
     if policy.allow_only_select:
@@ -54,15 +47,15 @@ def validate_sql(raw_sql: str, policy: Optional[SQLPolicy] = None) -> Validation
                 reasons.append("not_select")
         else:
             # allow SELECT or WITH ... SELECT
-            if not (STARTS_WITH_SELECT_RE.search(sql) or WITH_RE.search(sql)):
+            if not SELECT_OR_WITH_RE.match(sql):
                 reasons.append("not_select_or_with")
 
     # 4) Forbidden keywords anywhere (cheap but effective)
     if policy.disallow_writes or policy.disallow_pragma_attach:
-        upper = _upper_sql(sql)
-        for kw in FORBIDDEN_KEYWORDS:
-            if kw in upper:
-                reasons.append(f"forbidden_keyword:{kw}")
+        found = {m.group(1).upper() for m in FORBIDDEN_RE.finditer(sql)}
+        if found:
+            # one reason per keyword, in FORBIDDEN_KEYWORDS order as before
+            reasons.extend(f"forbidden_keyword:{kw}" for kw in FORBIDDEN_KEYWORDS if kw in found)
 
     # 5) Optional: block SELECT *
     if policy.disallow_select_star and SELECT_STAR_RE.search(sql):
@@ -2,14 +2,50 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from collections import Counter
-import math
+from collections.abc import Sized
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import datetime as dt
+import math
+import os
 import re
 
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:  # optional: summarize_table falls back to the NumPy path
+    njit = None
+
+
+# ISO-ish prefix; the leading \s* replaces a separate strip() per cell.
+# ASCII digits only (all fromisoformat accepts), so matches sort like dates.
+_DATE_RE = re.compile(r"\s*(\d{4}-\d{2}-\d{2})", re.ASCII)
+
+# Nearest-rank quantiles reported per numeric column, built once at import.
+_QUANTILES_ALL = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+_QUANTILE_KEYS = ("min", "p25", "median", "p75", "max")
+_QUARTILES = _QUANTILES_ALL[1:4]
+
+# numeric columns at least this long get their stats computed on a thread pool
+_PARALLEL_MIN_VALUES = 50_000
+
+# numeric columns at least this long use the numba kernel (when installed);
+# below it the NumPy path is as fast and small reports never pay the JIT compile
+_KERNEL_MIN_VALUES = 10_000
+
+# values per Counter.update() step when probing categorical cardinality
+_COUNT_CHUNK = 4096
+
+# Everything float() accepts starts like this (after optional whitespace/sign):
+# a digit, '.digit', or inf/infinity/nan.
+_NUM_PREFIX = re.compile(r"\s*[+-]?(?:\d|\.\d|inf|nan)", re.IGNORECASE).match
 
-_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")  # ISO-ish prefix
+# markdown cell escaping: newline -> space, | -> \| in one translate() pass
+_MD_CELL_ESCAPE = str.maketrans({"\n": " ", "|": "\\|"})
 
 
 @dataclass(frozen=True)
@@ -35,6 +71,10 @@ def _try_float(x: Any) -> Optional[float]:
     if isinstance(x, (int, float)) and not isinstance(x, bool):
         return float(x)
     if isinstance(x, str):
+        # Cheap prefix test first: raising and catching ValueError costs far
+        # more than a regex miss, and most text cells are not numbers.
+        if _NUM_PREFIX(x) is None:
+            return None
         try:
             return float(x)
         except Exception:
@@ -43,59 +83,201 @@ def _try_float(x: Any) -> Optional[float]:
 
 
 def _try_date(x: Any) -> Optional[dt.date]:
-    if _is_null(x):
-        return None
-    if isinstance(x, (dt.date, dt.datetime)):
-        return x.date() if isinstance(x, dt.datetime) else x
-    if isinstance(x, str) and _DATE_RE.match(x.strip()):
-        s = x.strip()[:10]
+    # Strings first (the common cell type); blank strings simply fail the match.
+    if isinstance(x, str):
+        m = _DATE_RE.match(x)
+        if m is None:
+            return None
         try:
-            return dt.date.fromisoformat(s)
+            return dt.date.fromisoformat(m.group(1))
         except Exception:
             return None
+    if isinstance(x, (dt.date, dt.datetime)):
+        return x.date() if isinstance(x, dt.datetime) else x
     return None
 
 
 def _infer_column_type(values: List[Any]) -> str:
-    non_null = [v for v in values if not _is_null(v)]
+    # Only the first 50 non-null values are inspected; stop scanning there.
+    non_null = list(itertools.islice((v for v in values if not _is_null(v)), 50))
     if not non_null:
         return "null"
 
+    sample_n = len(non_null)
     # date-like
+    date_threshold = max(3, int(0.6 * sample_n))
+    # numeric-like; if we have very few rows, be lenient
+    threshold = 1 if sample_n < 3 else int(0.8 * sample_n)
+    threshold = max(1, threshold)
+
+    # One pass for both probes: a value that parses as a date never parses
+    # as a float, so the float check only runs on non-dates. Stop as soon as
+    # the outcome can no longer change.
     date_hits = 0
-    for v in non_null[:50]:
+    num_hits = 0
+    for i, v in enumerate(non_null):
         if _try_date(v) is not None:
             date_hits += 1
-    if date_hits >= max(3, int(0.6 * min(len(non_null), 50))):
-        return "date"
-
-    # numeric-like
-    num_hits = 0
-    for v in non_null[:50]:
-        if _try_float(v) is not None:
+            if date_hits >= date_threshold:
+                return "date"
+        elif _try_float(v) is not None:
             num_hits += 1
-    sample_n = min(len(non_null), 50)
-    # if we have very few rows, be lenient
-    threshold = 1 if sample_n < 3 else int(0.8 * sample_n)
-    threshold = max(1, threshold)
+        remaining = sample_n - i - 1
+        if date_hits + remaining < date_threshold:
+            if num_hits >= threshold:
+                return "numeric"
+            if num_hits + remaining < threshold:
+                return "text"
 
     if num_hits >= threshold:
         return "numeric"
 
-
     return "text"
 
 
-def _quantiles(sorted_vals: List[float], qs: List[float]) -> Dict[str, float]:
-    if not sorted_vals:
-        return {}
-    n = len(sorted_vals)
-    out: Dict[str, float] = {}
-    for q in qs:
-        idx = int(round((n - 1) * q))
-        idx = max(0, min(n - 1, idx))
-        out[str(q)] = sorted_vals[idx]
-    return out
+def _quantiles(vals: np.ndarray, qs: np.ndarray) -> List[float]:
+    # Nearest-rank quantiles via one quickselect (np.partition) over all
+    # requested ranks: O(n) instead of sorting the whole column.
+    if not len(vals):
+        return []
+    idx = _rank_indices(len(vals), qs)
+    part = np.partition(vals, np.unique(idx))
+    return [float(part[i]) for i in idx]
+
+
+def _rank_indices(n: int, qs: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint((n - 1) * qs).astype(np.intp), 0, n - 1)
+
+
+if njit is not None:
+
+    # reassoc/contract let LLVM vectorize the reductions; the full fastmath
+    # set is avoided because it assumes no inf values, which columns can hold.
+    @njit(cache=True, nogil=True, fastmath={"reassoc", "contract"})
+    def _numeric_stats_kernel(a, ranks):
+        n = a.shape[0]
+        # shifted sums keep the one-pass variance stable for large offsets;
+        # an infinite shift would turn the mean into inf - inf = NaN
+        k = a[0] if np.isfinite(a[0]) else 0.0
+        s = 0.0
+        s2 = 0.0
+        mn = a[0]
+        mx = a[0]
+        for i in range(n):
+            x = a[i]
+            d = x - k
+            s += d
+            s2 += d * d
+            mn = min(mn, x)
+            mx = max(mx, x)
+        mean = k + s / n
+        var = max((s2 - s * s / n) / n, 0.0)
+        part = np.partition(a, ranks)
+        return n, mn, part[ranks[0]], part[ranks[1]], part[ranks[2]], mx, mean, np.sqrt(var)
+
+
+def _numeric_stats(nums: np.ndarray) -> Dict[str, Any]:
+    if njit is not None and len(nums) >= _KERNEL_MIN_VALUES:
+        # compiled (or loaded from numba's on-disk cache) on the first such column
+        return _numeric_stats_jit(nums)
+    return _numeric_stats_numpy(nums)
+
+
+def _numeric_stats_jit(nums: np.ndarray) -> Dict[str, Any]:
+    ranks = _rank_indices(len(nums), _QUARTILES)
+    n, mn, p25, med, p75, mx, mean, std = _numeric_stats_kernel(np.ascontiguousarray(nums), ranks)
+    return {
+        "count": int(n),
+        "min": float(mn),
+        "p25": float(p25),
+        "median": float(med),
+        "p75": float(p75),
+        "max": float(mx),
+        "mean": float(mean),
+        "std": float(std),
+    }
+
+
+def _numeric_stats_numpy(nums: np.ndarray) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"count": len(nums)}
+    stats.update(zip(_QUANTILE_KEYS, _quantiles(nums, _QUANTILES_ALL)))
+    # nums.std() would recompute the mean; reuse it and let BLAS sum the squares
+    mean = float(nums.mean())
+    d = nums - mean
+    stats["mean"] = mean
+    # std dev (population)
+    stats["std"] = math.sqrt(float(d @ d) / len(nums))
+    return stats
+
+
+def _all_numeric_stats(inputs: List[Tuple[str, np.ndarray]]) -> Dict[str, Dict[str, Any]]:
+    """
+    _numeric_stats per column, in input order. The numba kernel (nogil) and the
+    NumPy reductions release the GIL, so large columns are spread over threads;
+    small results stay serial where pool startup would dominate.
+    """
+    workers = min(len(inputs), os.cpu_count() or 1)
+    if workers < 2 or max(len(a) for _, a in inputs) < _PARALLEL_MIN_VALUES:
+        return {c: _numeric_stats(a) for c, a in inputs}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip((c for c, _ in inputs), pool.map(_numeric_stats, (a for _, a in inputs))))
+
+
+def _column_matrix(rows: List[Tuple[Any, ...]], n_cols: int) -> np.ndarray:
+    # One (n_rows, n_cols) object array; columns are then views (data[:, i])
+    # instead of n_rows * n_cols list appends.
+    try:
+        data = np.array(rows, dtype=object)
+    except ValueError:
+        data = None
+    if data is not None and data.shape == (len(rows), n_cols):
+        return data
+    # ragged rows: short rows stay None-padded, extra cells are dropped
+    data = np.empty((len(rows), n_cols), dtype=object)
+    for j, r in enumerate(rows):
+        r = tuple(r[:n_cols])
+        data[j, : len(r)] = r
+    return data
+
+
+def _is_iso_date(s: str) -> bool:
+    try:
+        dt.date.fromisoformat(s)
+    except ValueError:
+        return False
+    return True
+
+
+def _date_range(column: str, vals: Iterable[Any]) -> Optional[Dict[str, Any]]:
+    # ISO 'YYYY-MM-DD' strings order like the dates they spell, so min/max are
+    # C-level string reductions over the distinct matches and only the two
+    # extremes are parsed (to catch impossible dates such as 2021-02-30).
+    # Date objects are compared as dates.
+    strs = set()
+    dates: List[dt.date] = []
+    match = _DATE_RE.match  # bound once; this loop runs per cell
+    for x in vals:
+        if isinstance(x, str):
+            m = match(x)
+            if m is not None:
+                strs.add(m.group(1))
+        elif isinstance(x, (dt.date, dt.datetime)):
+            dates.append(x.date() if isinstance(x, dt.datetime) else x)
+
+    found: List[str] = []
+    if dates:
+        found += [min(dates).isoformat(), max(dates).isoformat()]
+    if strs:
+        lo, hi = min(strs), max(strs)
+        if not (_is_iso_date(lo) and _is_iso_date(hi)):
+            # rare: an impossible date sits at an extreme; validate them all
+            valid = [s for s in strs if _is_iso_date(s)]
+            lo, hi = (min(valid), max(valid)) if valid else (None, None)
+        if lo is not None:
+            found += [lo, hi]
+    if not found:
+        return None
+    return {"column": column, "min": min(found), "max": max(found)}
 
 
 def summarize_table(
@@ -104,65 +286,75 @@ def summarize_table(
     *,
     title: str = "Query Result",
     max_categories: int = 5,
+    known_types: Optional[Dict[str, str]] = None,
 ) -> TableSummary:
+    """
+    known_types: optional column name -> type ("numeric", "date", "text") for
+    columns whose type is already known (e.g. declared in the schema); those
+    columns skip sampling-based inference. A numeric hint that yields no numbers
+    is dropped and the column is inferred as usual.
+    """
     n_rows = len(rows)
     n_cols = len(columns)
 
-    col_values: Dict[str, List[Any]] = {c: [] for c in columns}
-    for r in rows:
-        for i, c in enumerate(columns):
-            col_values[c].append(r[i] if i < len(r) else None)
+    data = _column_matrix(rows, n_cols)
 
     inferred_types: Dict[str, str] = {}
-    numeric_stats: Dict[str, Dict[str, Any]] = {}
+    # numeric stats are computed after the column loop so they can run side by side
+    numeric_inputs: List[Tuple[str, np.ndarray]] = []
     categorical_top: Dict[str, List[Tuple[str, int]]] = {}
 
-    date_candidates: List[str] = []
-
-    for c in columns:
-        vals = col_values[c]
-        t = _infer_column_type(vals)
-        inferred_types[c] = t
+    # Date range detection: first date-like column, coerced while it is in hand
+    date_range: Optional[Dict[str, Any]] = None
 
-        if t == "date":
-            date_candidates.append(c)
+    for i, c in enumerate(columns):
+        vals = data[:, i]
+        t = known_types.get(c) if known_types else None
+        hinted = t is not None
+        if t is None:
+            t = _infer_column_type(vals)
 
         if t == "numeric":
-            nums = [v for v in (_try_float(x) for x in vals) if v is not None]
-            nums_sorted = sorted(nums)
-            if nums_sorted:
-                mean = sum(nums_sorted) / len(nums_sorted)
-                # std dev (population)
-                var = sum((x - mean) ** 2 for x in nums_sorted) / len(nums_sorted)
-                std = math.sqrt(var)
-                qs = _quantiles(nums_sorted, [0.0, 0.25, 0.5, 0.75, 1.0])
-                numeric_stats[c] = {
-                    "count": len(nums_sorted),
-                    "min": qs.get("0.0"),
-                    "p25": qs.get("0.25"),
-                    "median": qs.get("0.5"),
-                    "p75": qs.get("0.75"),
-                    "max": qs.get("1.0"),
-                    "mean": mean,
-                    "std": std,
-                }
+            # one C-level coercion into a packed float64 buffer (no boxed floats);
+            # non-numeric cells become NaN and are dropped
+            nums = pd.to_numeric(vals, errors="coerce").astype(np.float64, copy=False)
+            nums = nums[~np.isnan(nums)]
+            if nums.size < np.count_nonzero(np.not_equal(vals, None)):
+                # pandas rejects some strings float() accepts ("1_000", non-ASCII
+                # digits, a leading NBSP); recount those cells the way inference did
+                nums = np.fromiter(
+                    (f for f in map(_try_float, vals) if f is not None and f == f), dtype=np.float64
+                )
+            if nums.size:
+                numeric_inputs.append((c, nums))
+            elif hinted:
+                # hints match by bare name, so an aliased column (SELECT city AS id)
+                # can carry the wrong one; trust the values instead
+                t = _infer_column_type(vals)
+        inferred_types[c] = t
+
+        if t == "date" and date_range is None:
+            date_range = _date_range(c, vals)
 
         if t == "text":
             # treat as categorical if low-ish cardinality in sample
-            non_null = [str(v).strip() for v in vals if not _is_null(v)]
+            # _is_null inlined: stripping once and dropping "" is the same test
+            # for strings, and str() of a SQLite value is never blank otherwise
+            non_null = [s for s in [str(v).strip() for v in vals if v is not None] if s]
             if non_null:
-                counts = Counter(non_null)
-                # only show "top categories" if it is not basically all unique
-                if len(counts) <= max(50, int(0.5 * len(non_null))):
+                # only show "top categories" if it is not basically all unique;
+                # count in chunks so a high-cardinality column is abandoned
+                # as soon as it crosses the limit instead of after a full pass
+                limit = max(50, int(0.5 * len(non_null)))
+                counts: Counter = Counter()
+                for start in range(0, len(non_null), _COUNT_CHUNK):
+                    counts.update(non_null[start : start + _COUNT_CHUNK])
+                    if len(counts) > limit:
+                        break
+                else:
                     categorical_top[c] = counts.most_common(max_categories)
 
-    # Date range detection: pick first date-like column
-    date_range: Optional[Dict[str, Any]] = None
-    if date_candidates:
-        c = date_candidates[0]
-        ds = [d for d in (_try_date(x) for x in col_values[c]) if d is not None]
-        if ds:
-            date_range = {"column": c, "min": min(ds).isoformat(), "max": max(ds).isoformat()}
+    numeric_stats = _all_numeric_stats(numeric_inputs)
 
     bullets: List[str] = []
     bullets.append(f"Returned {n_rows} rows and {n_cols} columns.")
@@ -200,24 +392,38 @@ def summarize_table(
     )
 
 
-def render_markdown_table(columns: Tuple[str, ...], rows: List[Tuple[Any, ...]], *, max_rows: int = 15) -> str:
+def render_markdown_table(
+    columns: Tuple[str, ...],
+    rows: Iterable[Tuple[Any, ...]],
+    *,
+    max_rows: int = 15,
+    total_rows: Optional[int] = None,
+) -> str:
+    """
+    rows may be any iterable (e.g. a cursor); only max_rows + 1 are consumed.
+    The footer shows the exact total when rows is sized or total_rows is given.
+    """
     cols = list(columns)
-    show_rows = rows[:max_rows]
+    if total_rows is None and isinstance(rows, Sized):
+        total_rows = len(rows)
+    head = list(itertools.islice(rows, max_rows + 1))
+    show_rows = head[:max_rows]
 
     def esc(x: Any) -> str:
-        s = "" if x is None else str(x)
-        s = s.replace("\n", " ").replace("|", "\\|")
-        return s
+        return "" if x is None else str(x).translate(_MD_CELL_ESCAPE)
 
     header = "| " + " | ".join(cols) + " |"
     sep = "| " + " | ".join(["---"] * len(cols)) + " |"
-    body = "\n".join("| " + " | ".join(esc(v) for v in r) + " |" for r in show_rows)
+    body = "\n".join(["| " + " | ".join([esc(v) for v in r]) + " |" for r in show_rows])
     if not body:
         body = "| " + " | ".join([""] * len(cols)) + " |"
 
     more = ""
-    if len(rows) > max_rows:
-        more = f"\n\nShowing first {max_rows} rows of {len(rows)}."
+    if total_rows is not None:
+        if total_rows > max_rows:
+            more = f"\n\nShowing first {max_rows} rows of {total_rows}."
+    elif len(head) > max_rows:
+        more = f"\n\nShowing first {max_rows} rows (more available)."
 
     return "\n".join([header, sep, body]) + more
 
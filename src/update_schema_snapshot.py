@@ -9,14 +9,14 @@ def main():
     if not db_path:
         raise RuntimeError("TEST_DB_PATH env var is required.")
 
-    schema = load_schema(db_path, include_stats=False)
+    schema = load_schema(db_path, include_stats=False, strong_hash=True)
     blob = serialize_schema_for_prompt(schema)
 
     out_dir = Path("tests/schema_snapshots")
     out_dir.mkdir(parents=True, exist_ok=True)
 
     (out_dir / "primary.txt").write_text(blob, encoding="utf-8")
-    (out_dir / "primary.sha256").write_text(schema.schema_version, encoding="utf-8")
+    (out_dir / "primary.blake2b").write_text(schema.schema_version, encoding="utf-8")
 
     print("Updated schema snapshots.")
 
@@ -0,0 +1,39 @@
+import sys
+import types
+
+import pytest
+
+from src.lazy_generator import LazySQLGenerator, clear_cache, get_generator, get_schema_service
+
+
+def test_generator_shared_until_cleared(sqlite_db_path):
+    clear_cache()
+    gen = get_generator(sqlite_db_path, "model", max_new_tokens=256)
+    assert get_generator(sqlite_db_path, "model", max_new_tokens=256) is gen
+    assert get_generator(sqlite_db_path, "model", max_new_tokens=128) is not gen
+    assert gen.schema_service is get_schema_service(sqlite_db_path)
+    # nothing generated yet, so the model was never loaded
+    assert not gen.loaded
+
+    clear_cache()
+    assert get_generator(sqlite_db_path, "model", max_new_tokens=256) is not gen
+
+
+def test_failed_load_is_not_retried(sqlite_db_path, monkeypatch):
+    calls = []
+
+    def failing_load(schema_service, cfg):
+        calls.append(cfg.model_name)
+        raise RuntimeError("CUDA out of memory")
+
+    fake = types.ModuleType("src.sql_generator")
+    fake.GenerationConfig = lambda **kw: types.SimpleNamespace(**kw)
+    fake.SQLGenerator = failing_load
+    monkeypatch.setitem(sys.modules, "src.sql_generator", fake)
+
+    gen = LazySQLGenerator(get_schema_service(sqlite_db_path), model_name="model")
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="out of memory"):
+            gen.generate_sql("How many stations are there?")
+    assert calls == ["model"]
+    assert not gen.loaded
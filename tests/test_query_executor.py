@@ -1,9 +1,12 @@
+import threading
+
 import pytest
 
 from src.query_executor import (
     QueryExecutor,
     RowLimitExceeded,
     SQLiteExecutionError,
+    TimeoutExceeded,
 )
 from src.sql_validator import validate_sql
 from src.sql_policy import SQLPolicy
@@ -37,3 +40,88 @@ def test_valid_query_executes():
     assert res.row_count <= 5
     assert "state" in res.columns
     assert "c" in res.columns
+
+
+def test_streaming_summary_matches_execute():
+    executor = QueryExecutor(DB)
+
+    sql = "SELECT state, COUNT(*) c FROM fuel_stations GROUP BY state"
+    res = executor.execute(sql)
+    summary = executor.execute_streaming(sql, preview_rows=3)
+
+    assert summary.columns == res.columns
+    assert summary.row_count == res.row_count
+    assert summary.preview == res.rows[:3]
+
+    again = executor.execute_streaming(sql)
+    assert again.fingerprint == summary.fingerprint
+
+
+def test_streaming_row_limit_enforced():
+    executor = QueryExecutor(DB, max_rows=5)
+
+    with pytest.raises(RowLimitExceeded):
+        executor.execute_streaming("SELECT * FROM fuel_stations LIMIT 100")
+
+
+def test_connection_reused_across_queries():
+    executor = QueryExecutor(DB)
+
+    executor.execute("SELECT state FROM fuel_stations LIMIT 1")
+    conn = executor._tls.conn
+    executor.execute("SELECT city FROM fuel_stations LIMIT 1")
+
+    assert conn is not None
+    assert executor._tls.conn is conn
+
+    executor.close()
+    assert getattr(executor._tls, "conn", None) is None
+
+
+def test_connection_per_thread():
+    executor = QueryExecutor(DB)
+    executor.execute("SELECT state FROM fuel_stations LIMIT 1")
+    main_conn = executor._tls.conn
+
+    seen = []
+
+    def work():
+        executor.execute("SELECT city FROM fuel_stations LIMIT 1")
+        seen.append(executor._tls.conn)
+
+    t = threading.Thread(target=work)
+    t.start()
+    t.join()
+
+    assert seen and seen[0] is not main_conn
+    executor.close()
+
+
+def test_timeout_interrupts_running_query():
+    executor = QueryExecutor(DB, timeout_ms=50)
+    runaway = (
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+        "SELECT COUNT(*) FROM n"
+    )
+
+    with pytest.raises(TimeoutExceeded):
+        executor.execute(runaway)
+
+    # the connection is still usable afterwards
+    assert executor.execute("SELECT state FROM fuel_stations LIMIT 1").row_count == 1
+    executor.close()
+
+
+def test_execute_many_continues_past_errors():
+    executor = QueryExecutor(DB, max_rows=5)
+
+    out = list(executor.execute_many([
+        "SELECT state FROM fuel_stations LIMIT 2",
+        "SELECT * FROM fuel_stations LIMIT 100",
+        "SELECT city FROM fuel_stations LIMIT 3",
+    ]))
+
+    assert out[0].row_count == 2
+    assert isinstance(out[1], RowLimitExceeded)
+    assert out[2].row_count == 3
+    executor.close()
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.query_executor import QueryExecutor
+from src.retry_logic import RetryRunner
+from src.schema_service import SchemaService
+
+
+class _FakeGenerator:
+    def __init__(self, schema_service, sql=None, error=None):
+        self.schema_service = schema_service
+        self.model_name = "model"
+        self._sql = sql
+        self._error = error
+
+    def generate_sql(self, question, policy=None, error_context=None):
+        if self._error is not None:
+            raise self._error
+        return SimpleNamespace(sql_raw=self._sql, sql_clean=self._sql, latency_ms=0)
+
+
+class _BrokenExecutor:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def execute(self, sql):
+        raise RuntimeError("executor bug")
+
+
+def test_generator_errors_are_raised(sqlite_db_path):
+    # a missing model or failed load must not be reported as a SQL failure
+    gen = _FakeGenerator(SchemaService(sqlite_db_path), error=ModuleNotFoundError("No module named 'torch'"))
+    executor = QueryExecutor(sqlite_db_path)
+    runner = RetryRunner(gen, executor)
+
+    with pytest.raises(ModuleNotFoundError):
+        runner.run("How many stations are there?")
+    executor.close()
+
+
+def test_unexpected_execute_error_ends_the_run(sqlite_db_path):
+    gen = _FakeGenerator(SchemaService(sqlite_db_path), sql="SELECT COUNT(*) FROM fuel_stations")
+    runner = RetryRunner(gen, _BrokenExecutor(sqlite_db_path))
+
+    rr = runner.run("How many stations are there?")
+    assert not rr.ok
+    assert rr.stop_reason == "execution_deadend"
+    assert len(rr.attempts) == 1
+    assert rr.attempts[0].error_feedback.details == {"type": "RuntimeError"}
@@ -2,7 +2,7 @@
 import os
 from pathlib import Path
 
-from src.schema_loader import load_schema, serialize_schema_for_prompt
+from src.schema_loader import load_schema, load_schema_blob, serialize_schema_for_prompt
 
 SNAPSHOT_DIR = Path("tests/schema_snapshots")
 SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
@@ -11,7 +11,8 @@ def _snapshot_path(name: str) -> Path:
     return SNAPSHOT_DIR / f"{name}.txt"
 
 def _hash_path(name: str) -> Path:
-    return SNAPSHOT_DIR / f"{name}.sha256"
+    # strong schema_version: 128-bit BLAKE2b hex digest
+    return SNAPSHOT_DIR / f"{name}.blake2b"
 
 def test_schema_serialization_is_deterministic(sqlite_db_path):
     schema1 = load_schema(sqlite_db_path, include_stats=False)
@@ -23,13 +24,20 @@ def test_schema_serialization_is_deterministic(sqlite_db_path):
     assert blob1 == blob2
     assert schema1.schema_version == schema2.schema_version
 
+def test_schema_blob_matches_full_load(sqlite_db_path):
+    schema = load_schema(sqlite_db_path, include_stats=False)
+    blob, version = load_schema_blob(sqlite_db_path)
+
+    assert blob == serialize_schema_for_prompt(schema)
+    assert version == schema.schema_version
+
 def test_schema_drift_snapshot(sqlite_db_path):
     """
     Fails if schema changes.
     Update snapshot intentionally by deleting snapshot files and re-running,
     or by adding a dedicated "update snapshot" script/command in your Makefile.
     """
-    schema = load_schema(sqlite_db_path, include_stats=False)
+    schema = load_schema(sqlite_db_path, include_stats=False, strong_hash=True)
     blob = serialize_schema_for_prompt(schema)
 
     name = "primary"
@@ -0,0 +1,39 @@
+from src.lazy_generator import LazySQLGenerator
+from src.query_executor import QueryExecutor
+from src.retry_logic import RetryRunner
+from src.schema_service import SchemaService
+from src.sql_cache import SQLCache
+
+
+def test_sql_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "sql_cache.sqlite")
+    key = ("How many stations by state?", "db.sqlite", "v1", "model")
+
+    cache = SQLCache(path)
+    assert cache.get(key) is None
+    cache.put(key, "SELECT state, COUNT(*) FROM fuel_stations GROUP BY state LIMIT 200")
+    cache.close()
+
+    reopened = SQLCache(path)
+    assert reopened.get(key) == "SELECT state, COUNT(*) FROM fuel_stations GROUP BY state LIMIT 200"
+    # a different schema version is a different key
+    assert reopened.get(("How many stations by state?", "db.sqlite", "v2", "model")) is None
+    reopened.close()
+
+
+def test_failing_cached_sql_is_evicted(tmp_path, sqlite_db_path):
+    cache = SQLCache(str(tmp_path / "sql_cache.sqlite"))
+    gen = LazySQLGenerator(SchemaService(sqlite_db_path), model_name="model")
+    executor = QueryExecutor(sqlite_db_path)
+    runner = RetryRunner(gen, executor, sql_cache=cache)
+
+    key = runner._cache_key("stale question")
+    cache.put(key, "SELECT no_such_column FROM fuel_stations LIMIT 5")
+
+    assert runner.run_cached_many(["stale question"]) == [None]
+    # evicted, so run() generates instead of executing the same SQL again
+    assert cache.get(key) is None
+    assert not gen.loaded
+
+    executor.close()
+    cache.close()
@@ -25,6 +25,13 @@ def test_blocks_writes():
     assert not dec.ok
 
 
+def test_forbidden_keywords_match_whole_words_only():
+    assert validate_sql("SELECT created_at, updated_by FROM fuel_stations LIMIT 5").ok
+
+    dec = validate_sql("select state from fuel_stations where 1 = 1 or drop table fuel_stations")
+    assert dec.reasons == ("forbidden_keyword:DROP",)
+
+
 def test_adds_limit_if_missing():
     out = rewrite_sql("SELECT state, COUNT(*) c FROM fuel_stations GROUP BY state")
     assert "LIMIT" in out.sql.upper()
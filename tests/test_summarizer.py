@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from src import summarizer
+from src.summarizer import render_markdown_table, summarize_table
+
+
+def test_numeric_stats_use_nearest_rank_quantiles():
+    rows = [(i, str(i * 10)) for i in range(1, 6)] + [(None, "")]
+    ts = summarize_table(("a", "b"), rows)
+
+    st = ts.numeric_stats["a"]
+    assert st["count"] == 5
+    assert (st["min"], st["p25"], st["median"], st["p75"], st["max"]) == (1.0, 2.0, 3.0, 4.0, 5.0)
+    assert st["mean"] == 3.0
+    assert ts.numeric_stats["b"]["max"] == 50.0
+
+
+def test_ragged_rows_are_padded_not_broadcast():
+    ts = summarize_table(("a", "b", "c"), [(1,), (2, "x")])
+
+    assert ts.inferred_types["a"] == "numeric"
+    assert ts.inferred_types["c"] == "null"
+    assert "c" not in ts.numeric_stats
+
+
+def test_high_cardinality_text_has_no_top_categories():
+    rows = [(f"id-{i}", "A" if i % 3 else "B") for i in range(10_000)]
+    ts = summarize_table(("key", "grp"), rows)
+
+    assert "key" not in ts.categorical_top
+    assert ts.categorical_top["grp"] == [("A", 6666), ("B", 3334)]
+
+
+def test_known_types_skip_inference():
+    # too few numeric-looking values for inference, but the type is declared
+    rows = [("1",), ("x",), ("y",), ("3",)]
+    assert summarize_table(("a",), rows).inferred_types["a"] == "text"
+
+    ts = summarize_table(("a",), rows, known_types={"a": "numeric"})
+    assert ts.inferred_types["a"] == "numeric"
+    assert ts.numeric_stats["a"]["count"] == 2
+
+
+def test_numeric_coercion_matches_try_float():
+    rows = [("1_000",), ("\xa02",), ("\u0663",), ("4",)]
+    ts = summarize_table(("a",), rows, known_types={"a": "numeric"})
+    st = ts.numeric_stats["a"]
+    assert st["count"] == 4
+    assert (st["min"], st["max"]) == (2.0, 1000.0)
+
+
+def test_known_types_ignored_when_values_disagree():
+    # SELECT city AS id: the hint for "id" does not describe these values
+    rows = [("Denver",), ("Boulder",), ("Denver",)]
+    ts = summarize_table(("id",), rows, known_types={"id": "numeric"})
+    assert ts.inferred_types["id"] == "text"
+    assert "id" not in ts.numeric_stats
+    assert ts.categorical_top["id"] == [("Denver", 2), ("Boulder", 1)]
+
+
+def test_numba_kernel_matches_numpy_path():
+    pytest.importorskip("numba")
+    rng = np.random.default_rng(0)
+    cases = [
+        rng.normal(1e9, 5.0, 20_000),
+        rng.integers(-50, 50, 7).astype(np.float64),
+        np.array([-np.inf, 1.0, 2.0]),
+        np.array([1.0, 2.0, np.inf]),
+        np.array([42.0]),
+    ]
+    for a in cases:
+        jit, ref = summarizer._numeric_stats_jit(a), summarizer._numeric_stats_numpy(a)
+        assert jit.keys() == ref.keys()
+        np.testing.assert_allclose([jit[k] for k in ref], [ref[k] for k in ref], rtol=1e-9)
+
+
+def test_markdown_table_accepts_unsized_rows():
+    out = render_markdown_table(("a",), iter([(i,) for i in range(10)]), max_rows=3)
+    assert out.endswith("Showing first 3 rows (more available).")
+
+    out = render_markdown_table(("a",), iter([(1,)]), max_rows=3, total_rows=1)
+    assert "Showing" not in out